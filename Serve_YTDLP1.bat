@@ -0,0 +1,3 @@
+@echo off
+venv\Scripts\python.exe ytdl_cli.py --serve
+pause
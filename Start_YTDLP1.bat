@@ -1,4 +1,3 @@
 @echo off
-venv\Scripts\python.exe -m pip install yt_dlp
 venv\Scripts\python.exe ytdl_cli.py
 pause
@@ -1,4 +1,4 @@
 @echo off
-venv\Scripts\python.exe -m pip install yt_dlp
+venv\Scripts\python.exe ytdl_cli.py --check-ytdlp
 venv\Scripts\python.exe ytdl_cli_v1.py
 pause
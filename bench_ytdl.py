@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+# ────────────────────────────────────────────────────────────────────────
+#  bench_ytdl.py
+#  ────────────────────────────────────────────────────────────────────────
+#  Offline benchmark of the ytdl_cli download pipeline.
+#  Generates test media with ffmpeg (testsrc/sine), serves it from a local
+#  HTTP server and feeds canned info dicts to ytdl_cli, then times the
+#  probe → select → fetch → merge → place stages for the ≤1080p and >1080p
+#  paths over several runs.
+#  ────────────────────────────────────────────────────────────────────────
+
+import argparse
+import functools
+import http.server
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# ------------------------------------------------------------------
+# Fixtures
+# ------------------------------------------------------------------
+FIXTURES = {
+    # name: (ffmpeg arguments, yt-dlp format fields)
+    "video_1080.mp4": (
+        ["-f", "lavfi", "-i", "testsrc=size=1920x1080:rate=30", "-c:v", "libx264", "-preset", "ultrafast",
+         "-pix_fmt", "yuv420p", "-an"],
+        {"format_id": "137", "ext": "mp4", "vcodec": "avc1.640028", "acodec": "none",
+         "width": 1920, "height": 1080, "fps": 30},
+    ),
+    "video_1440.webm": (
+        ["-f", "lavfi", "-i", "testsrc=size=2560x1440:rate=30", "-c:v", "libvpx-vp9", "-deadline", "realtime",
+         "-cpu-used", "8", "-b:v", "4M", "-an"],
+        {"format_id": "400", "ext": "webm", "vcodec": "vp09.00.50.08", "acodec": "none",
+         "width": 2560, "height": 1440, "fps": 30},
+    ),
+    "audio.m4a": (
+        ["-f", "lavfi", "-i", "sine=frequency=440", "-c:a", "aac", "-b:a", "128k", "-vn"],
+        {"format_id": "140", "ext": "m4a", "vcodec": "none", "acodec": "mp4a.40.2"},
+    ),
+}
+
+def make_fixtures(directory, seconds):
+    """Generate the test media once; files are reused while the duration matches."""
+    os.makedirs(directory, exist_ok=True)
+    stamp = os.path.join(directory, "fixtures.json")
+    if os.path.exists(stamp):
+        with open(stamp, "r", encoding="utf-8") as f:
+            if json.load(f).get("seconds") == seconds:
+                return
+    for name, (args, _) in FIXTURES.items():
+        print(f"🎬 Generating {name} ({seconds}s)")
+        subprocess.run(["ffmpeg", "-y", "-hide_banner", "-loglevel", "error", *args, "-t", str(seconds),
+                        os.path.join(directory, name)], check=True)
+    with open(stamp, "w", encoding="utf-8") as f:
+        json.dump({"seconds": seconds}, f)
+
+def serve(directory):
+    """Serve the fixtures on a random localhost port (stand-in for googlevideo)."""
+    handler = functools.partial(QuietHandler, directory=directory)
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+class QuietHandler(http.server.SimpleHTTPRequestHandler):
+    """Static file handler with single-range support (yt-dlp and the stream feeder use Range)."""
+
+    def do_GET(self):
+        match = re.match(r"bytes=(\d+)-(\d*)$", self.headers.get("Range", ""))
+        path = self.translate_path(self.path)
+        if not match or not os.path.isfile(path):
+            return super().do_GET()
+        size = os.path.getsize(path)
+        start = int(match.group(1))
+        end = min(int(match.group(2)) if match.group(2) else size - 1, size - 1)
+        if start >= size:
+            self.send_error(416)
+            return
+        self.send_response(206)
+        self.send_header("Content-Type", self.guess_type(path))
+        self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        self.send_header("Content-Length", str(end - start + 1))
+        self.send_header("Accept-Ranges", "bytes")
+        self.end_headers()
+        with open(path, "rb") as f:
+            f.seek(start)
+            self.wfile.write(f.read(end - start + 1))
+
+    def log_message(self, *args):
+        pass
+
+def canned_info(vid, base_url, fixtures_dir, seconds):
+    """Info dict shaped like a YouTube extraction, with every format served locally."""
+    formats = []
+    for name, (_, fields) in FIXTURES.items():
+        size = os.path.getsize(os.path.join(fixtures_dir, name))
+        formats.append({
+            **fields,
+            "url": f"{base_url}/{name}",
+            "protocol": "http",
+            "filesize": size,
+            "tbr": size * 8 / 1000 / seconds,
+        })
+    return {
+        "id": vid,
+        "title": f"Benchmark {vid}",
+        "channel": "Benchmark",
+        "upload_date": "20250101",
+        "duration": seconds,
+        "extractor": "youtube",
+        "extractor_key": "Youtube",
+        "webpage_url": f"https://www.youtube.com/watch?v={vid}",
+        "formats": formats,
+    }
+
+# ------------------------------------------------------------------
+# Benchmark
+# ------------------------------------------------------------------
+def load_pipeline(workdir, output_mode, stream_encode=False):
+    """Import ytdl_cli against a throw-away config (it reads config.json from the CWD)."""
+    with open(os.path.join(workdir, "config.json"), "w", encoding="utf-8") as f:
+        json.dump({
+            "base_path": os.path.join(workdir, "base"),
+            "temp_path": os.path.join(workdir, "tmp"),
+            "metrics_log": os.path.join(workdir, "metrics.jsonl"),
+            "cookies_browser": None,
+            "output_mode": output_mode,
+            "stream_encode": stream_encode,
+        }, f)
+    os.chdir(workdir)
+    sys.path.insert(0, REPO_DIR)
+    import ytdl_cli
+    return ytdl_cli
+
+def run_once(ytdl, vid, info, resolution):
+    """One pass through the pipeline; returns {stage: seconds}."""
+    timings = {}
+    ytdl._info_cache_put(vid, info)
+
+    start = time.perf_counter()
+    info = ytdl.get_info(vid)                         # probe (served from the info cache)
+    timings["probe"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    res = ytdl.pick_resolution(info, resolution)      # select
+    timings["select"] = time.perf_counter() - start
+
+    ytdl.download_video(vid, resolution=res)          # fetch → merge → place, timed via metrics
+    with open(ytdl.METRICS_LOG, "r", encoding="utf-8") as f:
+        for line in f:
+            record = json.loads(line)
+            if record.get("job") != f"{vid}:v" or record["event"] != "stage" or record.get("seconds") is None:
+                continue
+            stage = {"encode": "merge", "postprocess": "merge", "move": "place"}.get(record["stage"], record["stage"])
+            timings[stage] = timings.get(stage, 0) + record["seconds"]
+    return timings
+
+def print_report(results):
+    print(f"\n{'path':<10}{'stage':<9}{'runs':>5}{'min s':>9}{'median s':>10}{'max s':>9}")
+    for path, runs in results.items():
+        stages = sorted({s for r in runs for s in r}, key=["probe", "select", "fetch", "merge", "place", "job"].index)
+        for stage in stages:
+            values = [r[stage] for r in runs if stage in r]
+            print(f"{path:<10}{stage:<9}{len(values):>5}{min(values):>9.3f}"
+                  f"{statistics.median(values):>10.3f}{max(values):>9.3f}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmark of the ytdl_cli pipeline")
+    parser.add_argument("--runs", type=int, default=3, help="runs per path")
+    parser.add_argument("--seconds", type=int, default=10, help="duration of the generated test media")
+    parser.add_argument("--fixtures", default=os.path.join(tempfile.gettempdir(), "ytdlp1-bench-fixtures"),
+                        help="directory for the generated media (reused between benchmark runs)")
+    parser.add_argument("--output-mode", default="auto", help="output_mode for the >1080p merge")
+    parser.add_argument("--stream-encode", action="store_true",
+                        help="pipe the >1080p video stream into ffmpeg instead of downloading it first")
+    parser.add_argument("--json", metavar="FILE", help="also write the raw timings as JSON")
+    args = parser.parse_args()
+
+    make_fixtures(args.fixtures, args.seconds)
+    server = serve(args.fixtures)
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    with tempfile.TemporaryDirectory(prefix="ytdlp1-bench-") as workdir:
+        ytdl = load_pipeline(workdir, args.output_mode, args.stream_encode)
+        results = {"<=1080p": [], ">1080p": []}
+        for run in range(args.runs):
+            for path, tag, resolution in (("<=1080p", "l", 1080), (">1080p", "h", 1440)):
+                vid = f"b{tag}{run:09d}"    # fresh 11-char ID per run, so the archive never short-circuits
+                info = canned_info(vid, base_url, args.fixtures, args.seconds)
+                results[path].append(run_once(ytdl, vid, info, resolution))
+        os.chdir(REPO_DIR)
+
+    server.shutdown()
+    print_report(results)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -5,13 +5,37 @@
 #  Adds a short “video metadata” display before any download starts.
 #  ────────────────────────────────────────────────────────────────────────
 
-import yt_dlp
+import time
+STARTUP_T0 = time.perf_counter()   # startup breakdown is measured from here
+
 import os
 import re
 import json
 import subprocess
 import glob
 import datetime          # <-- new import
+import copy
+import hashlib
+import collections
+import urllib.parse
+import threading
+import contextlib
+import atexit
+import concurrent.futures
+import argparse
+import sys
+import sqlite3
+import tempfile
+import shutil
+import socket
+import uuid
+import functools
+import math
+import random
+import queue
+import http.server
+import urllib.request
+import importlib.metadata
 
 # ------------------------------------------------------------------
 # Load configuration
@@ -26,6 +50,92 @@ else:
 
 BASE_PATH = os.path.expanduser(config.get("base_path", "~/YouTubeDownloads"))
 
+# Probed info dicts are cached per video ID so one URL is only extracted once
+INFO_CACHE_DIR = os.path.join(BASE_PATH, ".info_cache")
+INFO_CACHE_TTL = config.get("info_cache_ttl", 3600)      # seconds
+INFO_CACHE_SIZE = config.get("info_cache_size", 64)      # entries kept on disk
+
+# Per-job scratch directories (put this on a fast local disk, base_path may be a NAS)
+TEMP_PATH = os.path.expanduser(config.get("temp_path") or os.path.join(tempfile.gettempdir(), "ytdlp1"))
+# Raw downloaded streams kept for reuse by later jobs (least recently used are evicted)
+STREAM_STORE = os.path.join(TEMP_PATH, "streams")
+STREAM_STORE_BYTES = int(config.get("stream_store_gb", 5) * 1024 ** 3)   # 0 disables the store
+RESUME_MAX_AGE = config.get("resume_max_age_days", 7) * 86400   # keep crashed workspaces this long
+
+# Local state (download archive, …) lives in one SQLite file under BASE_PATH
+STATE_DB = os.path.join(BASE_PATH, ".ytdlp1.sqlite")
+
+# Browser cookies are decrypted once and shared by every pooled YoutubeDL
+COOKIES_BROWSER = config.get("cookies_browser", "firefox")
+YDL_POOL_SIZE = config.get("ydl_pool_size", 8)           # idle YoutubeDL instances kept
+
+# High-res merge: "auto", "remux" (stream copy), "reencode" (libx264) or "hw" (VAAPI/QSV)
+OUTPUT_MODE = config.get("output_mode", "auto")
+# "h264" = final file must be H.264/AAC MP4, "any" = keep the source codecs
+COMPAT_TARGET = config.get("compat_target", "h264")
+
+# Cost model for format selection: expected download rate and software encode throughput
+BANDWIDTH_MBPS = config.get("bandwidth_mbps", 50)
+ENCODE_PIXELS_PER_S = config.get("encode_pixels_per_s", 120e6)   # libx264 -preset fast, all cores
+
+# Parallel range/fragment connections per stream: "auto" (adaptive), a fixed number, or 1 (off)
+FRAGMENT_CONNECTIONS = config.get("fragment_connections", "auto")
+MAX_FRAGMENT_CONNECTIONS = config.get("max_fragment_connections", 8)
+
+# Per-stage timings, throughput and encode speed are appended here as JSON lines
+METRICS_LOG = config.get("metrics_log", os.path.join(BASE_PATH, "metrics.jsonl"))
+
+# Pipe the >1080p video stream straight into ffmpeg instead of writing it to disk first
+STREAM_ENCODE = config.get("stream_encode", False)
+
+# Concurrency limits: network transfers and CPU-heavy ffmpeg runs are limited separately
+CPU_COUNT = os.cpu_count() or 1
+NETWORK_WORKERS = config.get("network_workers", 3)
+FFMPEG_WORKERS = config.get("ffmpeg_workers", "auto")   # "auto": one encode per 8 cores
+if FFMPEG_WORKERS == "auto":
+    FFMPEG_WORKERS = max(1, CPU_COUNT // 8)
+NET_SLOTS = threading.BoundedSemaphore(NETWORK_WORKERS)
+FFMPEG_SLOTS = threading.BoundedSemaphore(FFMPEG_WORKERS)
+
+# Audio jobs: "mp3" (192k), "opus" (128k) or "native" (keep the downloaded m4a/opus, no transcode)
+AUDIO_FORMAT = config.get("audio_format", "mp3")
+# Concurrent audio encodes; lame/libopus use one core each, so "auto" = one per core
+# (cores are shared with video encodes, which run with fewer threads meanwhile – see CoreBudget)
+AUDIO_ENCODERS = config.get("audio_encoders", "auto")
+if AUDIO_ENCODERS == "auto":
+    AUDIO_ENCODERS = CPU_COUNT
+AUDIO_SLOTS = threading.BoundedSemaphore(AUDIO_ENCODERS)
+
+# Global download rate limit shared by every job (Mbit/s, null = unlimited)
+RATE_LIMIT_MBPS = config.get("rate_limit_mbps")
+
+# Check for a newer yt-dlp (in the background) at most this often; 0 disables the check
+YTDLP_UPDATE_HOURS = config.get("ytdlp_update_hours", 24)
+
+# Retries per error class: [retries, first delay in seconds], the delay doubles per attempt
+RETRY_POLICY = {
+    "network": [4, 2],      # timeouts, resets, DNS hiccups – usually gone after a moment
+    "throttled": [3, 30],   # HTTP 429 – every job on that host pauses, not just this one
+    "forbidden": [2, 5],    # HTTP 403 / rejected stream URLs – probe again, then retry
+    "ffmpeg": [0, 0],       # same input fails the same way
+    "format": [0, 0],       # the caller decides (≤1080p: fallback format)
+    "other": [0, 0],
+}
+RETRY_POLICY.update(config.get("retry_policy", {}))
+RETRY_MAX_DELAY = 300
+
+# Distributed workers (--worker): lease length (renewed while a job runs) and attempts per job
+LEASE_SECONDS = config.get("lease_seconds", 120)
+MAX_ATTEMPTS = config.get("max_attempts", 3)
+
+# Daemon mode (--serve): job API on this address (keep it on localhost, there is no auth)
+SERVE_HOST = config.get("serve_host", "127.0.0.1")
+SERVE_PORT = config.get("serve_port", 8765)
+
+# Channel sync: a video that failed waits this long before it is tried again (doubles per failure)
+SYNC_RETRY_DAYS = config.get("sync_retry_days", 1)
+SYNC_RETRY_MAX_DAYS = 30
+
 # ------------------------------------------------------------------
 # Helpers
 # ------------------------------------------------------------------
@@ -34,25 +144,1130 @@ def clean_string_regex(text: str) -> str:
     pattern = r"[^a-zA-Z0-9 ]"
     return re.sub(pattern, "", new_text)
 
-def get_info(url):
-    """Fetch info about a video or playlist/channel."""
-    ydl_opts = {
-        "quiet": True,
-        "skip_download": True,
-        "extractor_args": {"youtube": {"player_client": "web"}},
-        "cookiesfrombrowser": ("firefox",),
-    }
-    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-        return ydl.extract_info(url, download=False)
+def sanitize_info(info, _):
+    info["title"] = clean_string_regex(info["title"])
+    info["channel"] = clean_string_regex(info.get("channel") or info.get("uploader") or "UnknownChannel")
+    return info
+
+# ------------------------------------------------------------------
+# Startup (lazy yt-dlp import, cached version check, startup timing)
+# ------------------------------------------------------------------
+YTDLP_MARKER = os.path.join(sys.prefix, ".ytdlp1-ytdlp.json")   # per venv: last seen version + check time
+YTDLP_INSTANCES = os.path.join(sys.prefix, ".ytdlp1-instances")  # one locked file per running process
+YTDLP_UPDATING = os.path.join(sys.prefix, ".ytdlp1-updating.lock")  # locked while pip replaces yt-dlp
+_instance_file = None
+_startup_marks = []   # (step, seconds since the previous mark)
+_startup_last = STARTUP_T0
+_ytdlp_module = None
+_ytdlp_update = None  # background `pip install -U yt-dlp`, if one was started
+_ytdlp_lock = threading.Lock()
+
+def startup_mark(step):
+    global _startup_last
+    now = time.perf_counter()
+    _startup_marks.append((step, now - _startup_last))
+    _startup_last = now
+
+def print_startup_times():
+    total = time.perf_counter() - STARTUP_T0
+    steps = ", ".join(f"{step} {secs:.2f}s" for step, secs in _startup_marks)
+    print(f"⏱  Ready in {total:.2f}s ({steps})")
+    emit_metric("startup", seconds=round(total, 3), **{step: round(secs, 3) for step, secs in _startup_marks})
+
+def ytdlp():
+    """The yt_dlp module, imported on first use rather than at startup (it is the slowest import)."""
+    global _ytdlp_module
+    if _ytdlp_module is None:
+        with _ytdlp_lock:
+            if _ytdlp_module is None:
+                if _ytdlp_update is not None:
+                    if _ytdlp_update.poll() is None:
+                        print("⏳ Waiting for the yt-dlp update to finish…")
+                        _ytdlp_update.wait()
+                else:
+                    _wait_for_foreign_update()
+                start = time.perf_counter()
+                importlib.invalidate_caches()   # pick up a version installed since startup
+                import yt_dlp
+                emit_metric("startup", step="import_yt_dlp", seconds=round(time.perf_counter() - start, 3))
+                _ytdlp_module = yt_dlp
+    return _ytdlp_module
+
+def _pip_install_ytdlp(upgrade=False, background=False):
+    cmd = [sys.executable, "-m", "pip", "install", "-q", "--disable-pip-version-check", "yt-dlp"]
+    if upgrade:
+        cmd.insert(4, "-U")
+    if background:
+        return subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    subprocess.run(cmd, check=True)
+
+def _register_instance():
+    """Mark this process as running from the venv; the lock goes away with the process."""
+    global _instance_file
+    try:
+        os.makedirs(YTDLP_INSTANCES, exist_ok=True)
+        _instance_file = open(os.path.join(YTDLP_INSTANCES, f"{os.getpid()}.lock"), "w")
+        _lock_file(_instance_file)
+    except OSError:
+        pass   # read-only environment: nobody can update it either
+
+def _other_instances():
+    """Number of other processes running from this venv; files of crashed ones are removed."""
+    count = 0
+    for entry in os.scandir(YTDLP_INSTANCES) if os.path.isdir(YTDLP_INSTANCES) else ():
+        if _instance_file and entry.path == _instance_file.name:
+            continue
+        try:
+            with open(entry.path, "a+") as f:
+                live = not _lock_file(f)
+            if not live:
+                os.remove(entry.path)
+        except OSError:
+            live = True   # still open in its process (Windows)
+        count += live
+    return count
+
+def _wait_for_foreign_update():
+    """Block while another process upgrades yt-dlp, so this one never imports a half-installed package."""
+    shown = False
+    while os.path.exists(YTDLP_UPDATING):
+        with open(YTDLP_UPDATING, "a+") as f:
+            if _lock_file(f):
+                return
+        if not shown:
+            print("⏳ Waiting for another instance's yt-dlp update to finish…")
+            shown = True
+        time.sleep(1)
+
+def _start_ytdlp_update():
+    """Background `pip install -U yt-dlp` holding the update lock until pip exits; None if busy."""
+    try:
+        lock = open(YTDLP_UPDATING, "a+")
+    except OSError:
+        return None
+    if not _lock_file(lock):
+        lock.close()
+        return None
+    proc = _pip_install_ytdlp(upgrade=True, background=True)
+
+    def release():
+        proc.wait()
+        lock.close()
+    threading.Thread(target=release, daemon=True).start()
+    return proc
+
+def check_ytdlp_version(wait=False):
+    """Replace the launchers' per-start `pip install yt_dlp` with a cached check.
+
+    The installed version comes from package metadata (no import, no network). yt-dlp is
+    installed if missing; otherwise an upgrade runs in the background at most every
+    YTDLP_UPDATE_HOURS while the user types, and ytdlp() waits for it if it is still running.
+    The upgrade is postponed while another process (--serve, --worker, a second window)
+    runs from the same venv, since it imports yt-dlp modules lazily.
+    """
+    global _ytdlp_update
+    _register_instance()
+    try:
+        with open(YTDLP_MARKER, "r", encoding="utf-8") as f:
+            marker = json.load(f)
+    except (OSError, ValueError):
+        marker = {}
+    try:
+        version = importlib.metadata.version("yt-dlp")
+    except importlib.metadata.PackageNotFoundError:
+        print("📦 Installing yt-dlp…")
+        _pip_install_ytdlp()
+        version, marker = importlib.metadata.version("yt-dlp"), {"checked": time.time()}
+    if marker.get("version") and marker["version"] != version:
+        print(f"📦 yt-dlp {marker['version']} → {version}")
+
+    checked = marker.get("checked", 0)
+    if YTDLP_UPDATE_HOURS and time.time() - checked > YTDLP_UPDATE_HOURS * 3600:
+        others = _other_instances()
+        if not others:
+            _ytdlp_update = _start_ytdlp_update()
+        if _ytdlp_update is None:
+            print("⏭  yt-dlp update postponed: another instance is running from this venv")
+        else:
+            checked = time.time()
+        if wait and _ytdlp_update is not None:
+            _ytdlp_update.wait()
+            importlib.invalidate_caches()
+            version = importlib.metadata.version("yt-dlp")
+    if marker != {"version": version, "checked": checked}:
+        try:
+            with open(YTDLP_MARKER, "w", encoding="utf-8") as f:
+                json.dump({"version": version, "checked": checked}, f)
+        except OSError:
+            pass   # read-only environment: check again next time
+    return version
+
+# ------------------------------------------------------------------
+# Scheduler (global bandwidth limit, ffmpeg slots, job priorities)
+# ------------------------------------------------------------------
+class RateLimiter:
+    """Token bucket shared by every transfer; consume() sleeps once the bucket runs dry."""
+
+    def __init__(self, mbps, burst_s=1.0):
+        self.set_rate(mbps, burst_s)
+        self.lock = threading.Lock()
+
+    def set_rate(self, mbps, burst_s=1.0):
+        self.rate = mbps * 1e6 / 8 if mbps else None   # bytes/s
+        self.burst = self.rate * burst_s if self.rate else 0
+        self.tokens = self.burst
+        self.stamp = time.monotonic()
+
+    def consume(self, nbytes):
+        if not self.rate or nbytes <= 0:
+            return
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.stamp) * self.rate)
+            self.stamp = now
+            self.tokens -= nbytes
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0
+        if wait:
+            time.sleep(wait)   # outside the lock: other transfers keep accounting meanwhile
+
+RATE_LIMITER = RateLimiter(RATE_LIMIT_MBPS)
+_rate_seen = {}   # file being downloaded -> bytes already charged to the bucket
+_rate_lock = threading.Lock()
+
+def throttle_progress(d):
+    """Charge the bytes a yt-dlp progress report adds since the previous one."""
+    name = d.get("tmpfilename") or d.get("filename")
+    done = d.get("downloaded_bytes") or 0
+    with _rate_lock:
+        delta = done - _rate_seen.get(name, 0)
+        if d["status"] == "downloading":
+            _rate_seen[name] = done
+        else:
+            _rate_seen.pop(name, None)
+    RATE_LIMITER.consume(delta)
+
+def encoder_threads():
+    """Threads per ffmpeg encode, so parallel encodes share the cores instead of oversubscribing."""
+    return max(1, CPU_COUNT // FFMPEG_WORKERS)
+
+class CoreBudget:
+    """CPU cores shared by every ffmpeg run (video encodes and audio encoders alike).
+
+    take(wanted) grants what is free, at least one core: a libx264 encode that starts
+    while audio encoders are busy runs with fewer threads instead of oversubscribing.
+    """
+
+    def __init__(self, cores):
+        self.free = cores
+        self.cond = threading.Condition()
+
+    @contextlib.contextmanager
+    def take(self, wanted):
+        with self.cond:
+            self.cond.wait_for(lambda: self.free >= 1)
+            granted = min(wanted, self.free)
+            self.free -= granted
+        try:
+            yield granted
+        finally:
+            with self.cond:
+                self.free += granted
+                self.cond.notify_all()
+
+CPU_CORES = CoreBudget(CPU_COUNT)
+
+@functools.lru_cache(maxsize=None)
+def _ffmpeg_postprocessors():
+    """yt-dlp ffmpeg postprocessors that encode; Merger and the Fixup* ones only copy streams."""
+    base = ytdlp().postprocessor.FFmpegPostProcessor
+    keys = {cls.pp_key() for cls in vars(ytdlp().postprocessor).values()
+            if isinstance(cls, type) and issubclass(cls, base) and cls is not base}
+    return {key for key in keys if key != "Merger" and not key.startswith("Fixup")}
+
+def _release_pp_slot():
+    if getattr(_job_local, "pp_slot", False):
+        _job_local.pp_slot = False
+        FFMPEG_SLOTS.release()
+
+def _release_net_slot():
+    if getattr(_job_local, "net_slot", False):
+        _job_local.net_slot = False
+        NET_SLOTS.release()
+
+def job_priority(job):
+    """Batch ordering: audio first, then videos by expected cost (height × duration)."""
+    if job.get("error") or job["mode"] == "a":
+        return 0
+    height = job.get("resolution") or job.get("max_height") or 2160
+    vid = video_id(job["url"])
+    info = vid and _info_cache_get(_info_cache_key(vid))
+    duration = (info or {}).get("duration") or 600
+    return 1 + height * duration
+
+# ------------------------------------------------------------------
+# Errors and retries (classification, per-class backoff, per-host throttling)
+# ------------------------------------------------------------------
+NETWORK_ERROR_RE = re.compile(r"timed out|connection (reset|refused|aborted)|remote end closed|incompleteread|"
+                              r"temporary failure in name resolution|network is unreachable|read error", re.I)
+_host_until = {}   # host -> monotonic time before which nobody may contact it (after a 429)
+_host_lock = threading.Lock()
+
+def _error_chain(e):
+    """The exception and everything it wraps (yt-dlp nests the real cause in exc_info/cause)."""
+    seen, stack = set(), [e]
+    while stack:
+        x = stack.pop()
+        if x is None or id(x) in seen:
+            continue
+        seen.add(id(x))
+        yield x
+        exc_info = getattr(x, "exc_info", None)
+        stack += [x.__cause__, x.__context__, getattr(x, "cause", None),
+                  exc_info[1] if isinstance(exc_info, tuple) and len(exc_info) > 1 else None]
+
+def classify_error(e):
+    """format, throttled, forbidden, ffmpeg, network or other."""
+    found = set()
+    for x in _error_chain(e):
+        status = getattr(x, "status", None) or getattr(getattr(x, "response", None), "status", None)
+        text = str(x)
+        name = type(x).__name__
+        if "Requested format is not available" in text:
+            found.add("format")
+        if status == 429 or "HTTP Error 429" in text:
+            found.add("throttled")
+        if status == 403 or "HTTP Error 403" in text or name == "ReExtractInfo":
+            found.add("forbidden")
+        if isinstance(x, subprocess.CalledProcessError) or name == "PostProcessingError":
+            found.add("ffmpeg")
+        if isinstance(x, (TimeoutError, ConnectionError)) or name in ("TransportError", "IncompleteRead") \
+                or NETWORK_ERROR_RE.search(text):
+            found.add("network")
+    for cls in ("format", "throttled", "forbidden", "ffmpeg", "network"):
+        if cls in found:
+            return cls
+    return "other"
+
+def host_key(url):
+    """Throttling is per site (googlevideo.com, youtube.com), not per CDN node."""
+    host = urllib.parse.urlparse(url or "").hostname or ""
+    return ".".join(host.split(".")[-2:])
+
+def throttle_host(host, seconds):
+    with _host_lock:
+        _host_until[host] = max(_host_until.get(host, 0), time.monotonic() + seconds)
+
+def wait_for_host(host):
+    with _host_lock:
+        delay = _host_until.get(host, 0) - time.monotonic()
+    if delay > 0:
+        set_live(f"{host} throttled, waiting {delay:.0f}s")
+        time.sleep(delay)
+
+def with_retries(fn, host, what, on_retry=None):
+    """Call fn(), retrying per RETRY_POLICY for the class of each error; the last error is raised.
+
+    Budgets are per error class and per call; on_retry(error_class) runs before each retry.
+    """
+    attempts = collections.Counter()
+    while True:
+        wait_for_host(host)
+        try:
+            return fn()
+        except Exception as e:
+            cls = classify_error(e)
+            retries, base = RETRY_POLICY.get(cls, (0, 0))
+            if attempts[cls] >= retries:
+                raise
+            delay = min(RETRY_MAX_DELAY, base * 2 ** attempts[cls]) * random.uniform(0.8, 1.2)
+            attempts[cls] += 1
+            reason = " ".join(str(e).split())[:160] or type(e).__name__
+            emit_metric("retry", what=what, error_class=cls, attempt=attempts[cls], delay=round(delay, 1), error=reason)
+            print(f"↻ {what}: {cls} error, retry {attempts[cls]}/{retries} in {delay:.0f}s – {reason}")
+        # Back off outside the except block, so errors of on_retry() are not chained to this one
+        if cls == "throttled":
+            throttle_host(host, delay)   # the wait happens in wait_for_host, shared by all jobs
+        else:
+            time.sleep(delay)
+        if on_retry:
+            on_retry(cls)
+
+# ------------------------------------------------------------------
+# Telemetry (live status line + JSONL metrics log)
+# ------------------------------------------------------------------
+_job_local = threading.local()  # current job/stream of this thread
+_metrics_lock = threading.Lock()
+_live = collections.OrderedDict()  # "job[/stream]" -> status text
+_live_lock = threading.Lock()
+_live_thread = None
+
+def current_job():
+    return getattr(_job_local, "job", None)
+
+def emit_metric(event, **fields):
+    """Append one record to the JSONL metrics log."""
+    if not METRICS_LOG:
+        return
+    record = {"ts": round(time.time(), 3), "event": event, "job": current_job(), **fields}
+    with _metrics_lock:
+        os.makedirs(os.path.dirname(METRICS_LOG) or ".", exist_ok=True)
+        with open(METRICS_LOG, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record) + "\n")
+
+def _render_live():
+    """Background thread: redraw one status line with every active job while stdout is a terminal."""
+    shown = False
+    while True:
+        time.sleep(0.5)
+        with _live_lock:
+            # stages outside a job (the interactive probe, …) only show while a job runs
+            parts = [f"[{k}] {v}" for k, v in _live.items()] if any(
+                k.split("/")[0] != "main" for k in _live) else []
+        width = shutil.get_terminal_size().columns - 1
+        if parts:
+            print("\r" + " | ".join(parts)[:width].ljust(width), end="", flush=True)
+            shown = True
+        elif shown:
+            print("\r" + " " * width + "\r", end="", flush=True)
+            shown = False
+
+def set_live(text, stream=None):
+    """Update (or clear with text=None) the live status of the current job."""
+    global _live_thread
+    key = current_job() or "main"
+    stream = stream or getattr(_job_local, "stream", None)
+    if stream:
+        key = f"{key}/{stream}"
+    with _live_lock:
+        if text is None:
+            _live.pop(key, None)
+        else:
+            _live[key] = text
+        if _live_thread is None and sys.stdout.isatty():
+            _live_thread = threading.Thread(target=_render_live, daemon=True)
+            _live_thread.start()
+
+@contextlib.contextmanager
+def job_context(job, stream=None):
+    """Attribute metrics and live status emitted by this thread to a job (and stream)."""
+    previous = (current_job(), getattr(_job_local, "stream", None))
+    _job_local.job, _job_local.stream = job, stream
+    try:
+        yield
+    finally:
+        _job_local.job, _job_local.stream = previous
+
+@contextlib.contextmanager
+def timed_stage(stage, **fields):
+    """Time one pipeline stage (probe, fetch, encode, move, job) and log it."""
+    set_live(stage)
+    start = time.monotonic()
+    status = "failed"
+    try:
+        yield fields   # the stage may add fields (bytes, fps, …) before it ends
+        status = "ok"
+    finally:
+        emit_metric("stage", stage=stage, status=status, seconds=round(time.monotonic() - start, 3), **fields)
+        set_live(None if stage == "job" or current_job() is None else f"{stage} {status}")
+
+def instrumented_job(mode):
+    """Decorator for the download functions: job context, total timing and live line."""
+    def wrap(fn):
+        @functools.wraps(fn)
+        def run(url, *args, **kwargs):
+            with job_context(f"{video_id(url) or url}:{mode}"), timed_stage("job", url=url):
+                try:
+                    return fn(url, *args, **kwargs)
+                finally:
+                    with _live_lock:
+                        for key in [k for k in _live if k.split("/")[0] == current_job()]:
+                            del _live[key]
+        return run
+    return wrap
+
+def _dispatch_progress_hook(d, job=None, stream=None, connections=1):
+    """yt-dlp progress hook of every pooled instance: rate limit, live status, metrics.
+
+    job, stream and connections are bound per checkout (see ydl_session), because
+    fragment downloads report from yt-dlp's own threads, not the job's thread.
+    """
+    throttle_progress(d)
+    with job_context(job, stream):
+        _report_progress(d, connections)
+
+def _report_progress(d, connections):
+    if d["status"] == "downloading":
+        total = d.get("total_bytes") or d.get("total_bytes_estimate")
+        done = d.get("downloaded_bytes") or 0
+        speed = d.get("speed") or 0
+        pct = f"{100 * done / total:5.1f}%" if total else f"{done / 1048576:.0f} MiB"
+        set_live(f"fetch {pct} @ {speed / 1048576:.1f} MiB/s")
+    elif d["status"] == "finished":
+        size = d.get("total_bytes") or d.get("downloaded_bytes") or 0
+        elapsed = d.get("elapsed") or 0
+        emit_metric("download", stream=getattr(_job_local, "stream", None),
+                    format_id=(d.get("info_dict") or {}).get("format_id"), bytes=size, connections=connections,
+                    seconds=round(elapsed, 3), bytes_per_s=round(size / elapsed) if elapsed else None)
+        if elapsed:
+            observe_connection_throughput(size, elapsed, connections)
+        set_live("fetch done")
+
+def _dispatch_postprocessor_hook(d):
+    """yt-dlp postprocessor hook: time merger/extract-audio/… runs inside yt-dlp."""
+    pp = d.get("postprocessor")
+    if d["status"] == "started":
+        _release_net_slot()   # the downloads are done – postprocessing never holds a network slot
+        if pp in _ffmpeg_postprocessors() and not getattr(_job_local, "pp_slot", False):
+            set_live(f"waiting for ffmpeg slot ({pp})")
+            FFMPEG_SLOTS.acquire()   # yt-dlp's own ffmpeg runs count against the same cap
+            _job_local.pp_slot = True
+        _job_local.pp_started = time.monotonic()
+        set_live(f"postprocess {pp}")
+    elif d["status"] == "finished":
+        _release_pp_slot()
+        started = getattr(_job_local, "pp_started", None)
+        emit_metric("stage", stage="postprocess", postprocessor=pp, status="ok",
+                    seconds=round(time.monotonic() - started, 3) if started else None)
+
+def metrics_report(path=None):
+    """Print where the wall-clock time went, aggregated per stage from the metrics log."""
+    stages = collections.defaultdict(list)
+    rates = []
+    with open(path or METRICS_LOG, "r", encoding="utf-8") as f:
+        for line in f:
+            record = json.loads(line)
+            if record["event"] == "stage" and record.get("seconds") is not None:
+                stages[record.get("postprocessor") or record["stage"]].append(record["seconds"])
+            elif record["event"] == "download" and record.get("bytes_per_s"):
+                rates.append(record["bytes_per_s"])
+    print(f"{'stage':<16}{'count':>7}{'total s':>11}{'avg s':>9}{'max s':>9}")
+    for stage, secs in sorted(stages.items(), key=lambda e: -sum(e[1])):
+        print(f"{stage:<16}{len(secs):>7}{sum(secs):>11.1f}{sum(secs) / len(secs):>9.2f}{max(secs):>9.2f}")
+    if rates:
+        print(f"\nDownloads: {len(rates)}, mean {sum(rates) / len(rates) / 1048576:.2f} MiB/s per stream")
+
+# ------------------------------------------------------------------
+# Shared yt-dlp session (one cookie jar, one HTTP connection pool)
+# ------------------------------------------------------------------
+COMMON_YDL_OPTS = {
+    # "dashy" turns YouTube's plain https formats into range fragments, so large streams
+    # can be fetched over several connections (concurrent_fragment_downloads)
+    "extractor_args": {"youtube": {"player_client": "web",
+                                   **({"formats": ["dashy"]} if FRAGMENT_CONNECTIONS != 1 else {})}},
+    # Retries belong to with_retries(), which classifies the error and backs off per host;
+    # yt-dlp's own immediate retries would hammer a host that answered 429
+    "retries": 0,
+    "fragment_retries": 0,
+    "extractor_retries": 0,
+    "skip_unavailable_fragments": False,   # a lost fragment fails the attempt instead of leaving a gap
+    "progress_hooks": [_dispatch_progress_hook],
+    "postprocessor_hooks": [_dispatch_postprocessor_hook],
+    "noprogress": True,   # progress is shown by the live status line instead
+}
+
+_session_ydl = None
+_ydl_pool = collections.OrderedDict()   # option key -> idle YoutubeDL instances
+_ydl_pool_lock = threading.Lock()
+
+def _session():
+    """Return the base YoutubeDL that owns the cookie jar and the HTTP connections."""
+    global _session_ydl
+    with _ydl_pool_lock:
+        if _session_ydl is None:
+            opts = {"quiet": True, **COMMON_YDL_OPTS}
+            if COOKIES_BROWSER:
+                opts["cookiesfrombrowser"] = (COOKIES_BROWSER,)
+            _session_ydl = ytdlp().YoutubeDL(opts)
+            _session_ydl.cookiejar  # copy + decrypt the browser cookie DB once
+            atexit.register(close_ydl_pool)
+        return _session_ydl
+
+def _release_ydl(ydl):
+    # The request director belongs to the base session – detach it before closing
+    ydl.__dict__.pop("_request_director", None)
+    ydl.close()
+
+def close_ydl_pool():
+    global _session_ydl
+    with _ydl_pool_lock:
+        for idle in _ydl_pool.values():
+            for ydl in idle:
+                _release_ydl(ydl)
+        _ydl_pool.clear()
+        if _session_ydl is not None:
+            _session_ydl.close()
+            _session_ydl = None
+
+@contextlib.contextmanager
+def ydl_session(ydl_opts, paths=None, params=None):
+    """Check out a pooled YoutubeDL for this option set, sharing cookies and connections.
+
+    paths and params (per-download overrides read at download time) and the
+    progress hook bound to the current job are per-job and not part of the pool key.
+    """
+    base = _session()
+    opts = {**COMMON_YDL_OPTS, **ydl_opts}
+    key = json.dumps(opts, sort_keys=True, default=repr)
+
+    with _ydl_pool_lock:
+        idle = _ydl_pool.get(key)
+        ydl = idle.pop() if idle else None
+    if ydl is None:
+        ydl = ytdlp().YoutubeDL(opts)
+        ydl.cookiejar = base.cookiejar
+        ydl._request_director = base._request_director
+
+    ydl.params["paths"] = dict(paths or {})
+    ydl.params.update(params or {})
+    ydl._progress_hooks = [functools.partial(
+        _dispatch_progress_hook, job=current_job(), stream=getattr(_job_local, "stream", None),
+        connections=(params or {}).get("concurrent_fragment_downloads", 1))]
+    try:
+        yield ydl
+    finally:
+        with _ydl_pool_lock:
+            _ydl_pool.setdefault(key, []).append(ydl)
+            _ydl_pool.move_to_end(key)
+            evicted = []
+            while sum(len(v) for v in _ydl_pool.values()) > YDL_POOL_SIZE:
+                old_key, old = next(iter(_ydl_pool.items()))
+                evicted.append(old.pop(0))
+                if not old:
+                    del _ydl_pool[old_key]
+        for old in evicted:
+            _release_ydl(old)
+
+VIDEO_ID_RE = re.compile(r"(?:[?&]v=|youtu\.be/|/shorts/|/live/|/embed/)([A-Za-z0-9_-]{11})")
+
+def video_id(url):
+    """Return the 11-character YouTube video ID of a URL/ID, or None for channels/playlists."""
+    if re.fullmatch(r"[A-Za-z0-9_-]{11}", url):
+        return url
+    m = VIDEO_ID_RE.search(url)
+    return m.group(1) if m else None
+
+def normalize_url(url):
+    return url if url.startswith("http") else f"https://www.youtube.com/watch?v={url}"
+
+# ------------------------------------------------------------------
+# Info cache (memory LRU + one JSON file per entry under BASE_PATH)
+# ------------------------------------------------------------------
+_info_memo = collections.OrderedDict()
+_info_lock = threading.Lock()
+
+def _info_cache_key(url):
+    return video_id(url) or hashlib.sha1(url.encode("utf-8")).hexdigest()
+
+def _info_cache_file(key):
+    return os.path.join(INFO_CACHE_DIR, key + ".json")
+
+def _info_expired(info, fetched_at):
+    """True if the entry is older than the TTL or its signed stream URLs ran out."""
+    now = time.time()
+    if now - fetched_at > INFO_CACHE_TTL:
+        return True
+    for f in info.get("formats") or []:
+        expire = urllib.parse.parse_qs(urllib.parse.urlparse(f.get("url", "")).query).get("expire")
+        if expire and expire[0].isdigit() and int(expire[0]) < now + 60:
+            return True
+    return False
+
+def _info_cache_get(key):
+    entry = _info_memo.get(key)
+    if entry is None:
+        path = _info_cache_file(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        os.utime(path)  # mtime doubles as LRU timestamp
+    if _info_expired(entry["info"], entry["fetched_at"]):
+        _info_cache_drop(key)
+        return None
+    with _info_lock:
+        _info_memo[key] = entry
+        _info_memo.move_to_end(key)
+    return entry["info"]
+
+def _info_cache_put(key, info):
+    entry = {"fetched_at": time.time(), "info": info}
+    with _info_lock:
+        _info_memo[key] = entry
+        _info_memo.move_to_end(key)
+        while len(_info_memo) > INFO_CACHE_SIZE:
+            _info_memo.popitem(last=False)
+
+    os.makedirs(INFO_CACHE_DIR, exist_ok=True)
+    tmp = f"{_info_cache_file(key)}.{threading.get_ident()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(entry, f)
+    os.replace(tmp, _info_cache_file(key))
+
+    # LRU eviction on disk: drop the least recently used files above the limit
+    files = []
+    for path in glob.glob(os.path.join(INFO_CACHE_DIR, "*.json")):
+        try:
+            files.append((os.path.getmtime(path), path))
+        except OSError:
+            pass  # removed by a concurrent job
+    for _, old in sorted(files)[:-INFO_CACHE_SIZE]:
+        try:
+            os.remove(old)
+        except OSError:
+            pass
+
+def _info_cache_drop(key):
+    with _info_lock:
+        _info_memo.pop(key, None)
+    try:
+        os.remove(_info_cache_file(key))
+    except OSError:
+        pass
+
+def get_info(url, refresh=False):
+    """Fetch info about a video (cached per video ID); channels/playlists go through iter_entries()."""
+    if is_collection_url(url):
+        raise ValueError(f"Not a single video, list it with iter_entries(): {url}")
+
+    key = _info_cache_key(url)
+    if not refresh:
+        info = _info_cache_get(key)
+        if info is not None:
+            return info
+
+    def probe():
+        with NET_SLOTS, ydl_session({"quiet": True, "skip_download": True}) as ydl, timed_stage("probe", url=url):
+            return ydl.extract_info(url, download=False)
+    info = with_retries(probe, host_key(normalize_url(url)), "probe")
+    # Strip the per-run selection keys so the dict can be re-processed later
+    info = ytdlp().YoutubeDL.sanitize_info(info, remove_private_keys=True)
+    _info_cache_put(key, info)
+    return info
+
+# ------------------------------------------------------------------
+# State database + download archive
+# ------------------------------------------------------------------
+DB_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS archive (
+    video_id   TEXT NOT NULL,
+    mode       TEXT NOT NULL,              -- 'v' video, 'a' audio
+    resolution INTEGER NOT NULL DEFAULT 0, -- 0 for audio
+    path       TEXT,
+    added      REAL,
+    PRIMARY KEY (video_id, mode, resolution)
+);
+CREATE TABLE IF NOT EXISTS jobs (          -- unfinished jobs and their resumable workspace
+    job_key   TEXT PRIMARY KEY,            -- "<video id>:<mode>:<resolution>"
+    workspace TEXT,                        -- path on the host below (TEMP_PATH is host-local)
+    started   REAL,
+    host      TEXT
+);
+CREATE TABLE IF NOT EXISTS journal (       -- completed stages of unfinished jobs
+    job_key TEXT NOT NULL,
+    stage   TEXT NOT NULL,                 -- video, audio, merged
+    ts      REAL,
+    PRIMARY KEY (job_key, stage)
+);
+CREATE TABLE IF NOT EXISTS channels (      -- channels/playlists kept up to date by --sync
+    channel_url TEXT PRIMARY KEY,          -- uploads tab that is listed
+    last_sync   REAL,
+    last_new    INTEGER                    -- uploads found by the last sync
+);
+CREATE TABLE IF NOT EXISTS channel_videos (
+    channel_url TEXT NOT NULL,
+    video_id    TEXT NOT NULL,
+    title       TEXT,
+    upload_date TEXT,                      -- YYYYMMDD, filled in after download if the listing lacks it
+    duration    REAL,
+    max_height  INTEGER,                   -- highest downloaded video resolution
+    added       REAL,
+    failures    INTEGER NOT NULL DEFAULT 0, -- failed downloads in a row (private, members-only, …)
+    last_error  TEXT,
+    last_failed REAL,
+    PRIMARY KEY (channel_url, video_id)
+);
+CREATE INDEX IF NOT EXISTS channel_videos_id ON channel_videos (video_id);
+CREATE TABLE IF NOT EXISTS queue (         -- shared job queue of --worker processes (all hosts)
+    id          INTEGER PRIMARY KEY AUTOINCREMENT,
+    job         TEXT NOT NULL,             -- JSON job: url, mode, resolution, max_height
+    priority    REAL,
+    status      TEXT NOT NULL,             -- queued, leased, ok, failed
+    lease       TEXT,                      -- token of the current lease
+    worker      TEXT,                      -- "<host>:<pid>" holding the lease
+    lease_until REAL,
+    attempts    INTEGER NOT NULL DEFAULT 0,
+    result      TEXT,                      -- JSON: file, error, seconds
+    enqueued    REAL,
+    finished    REAL
+);
+CREATE INDEX IF NOT EXISTS queue_status ON queue (status, priority);
+"""
+# Columns added to existing tables after their first release: (table, column definition)
+DB_COLUMNS_ADDED = [
+    ("jobs", "host TEXT"),
+    ("channel_videos", "failures INTEGER NOT NULL DEFAULT 0"),
+    ("channel_videos", "last_error TEXT"),
+    ("channel_videos", "last_failed REAL"),
+]
+
+# "<date> - <res>p - <title> - <id>.mp4" and "<date>-<title>-<id>.mp3"
+ARCHIVE_VIDEO_RE = re.compile(r"^.+ - (\d+)p - .* - ([A-Za-z0-9_-]{11})\.(mp4|mkv|webm)$")
+ARCHIVE_AUDIO_RE = re.compile(r"^.+-([A-Za-z0-9_-]{11})\.(mp3|m4a|opus)$")
+
+_db_conn = None
+_db_lock = threading.RLock()
+_archive = None  # video_id -> {(mode, resolution): path}
+
+def db_execute(sql, params=()):
+    """Run one statement on the shared state DB (thread-safe) and return all rows."""
+    global _db_conn
+    with _db_lock:
+        if _db_conn is None:
+            os.makedirs(BASE_PATH, exist_ok=True)
+            # other hosts may hold the write lock (shared job queue), so wait for it
+            _db_conn = sqlite3.connect(STATE_DB, check_same_thread=False, isolation_level=None, timeout=30)
+            _db_conn.executescript(DB_SCHEMA)
+            for table, column in DB_COLUMNS_ADDED:
+                try:
+                    _db_conn.execute(f"ALTER TABLE {table} ADD COLUMN {column}")
+                except sqlite3.OperationalError:
+                    pass   # column already exists
+            # rows from before workspaces were scoped to their host
+            _db_conn.execute("UPDATE jobs SET host = ? WHERE host IS NULL", (socket.gethostname(),))
+        return _db_conn.execute(sql, params).fetchall()
+
+def _scan_archive_files():
+    """Yield (video_id, mode, resolution, path) for every finished file in the channel folders."""
+    if not os.path.isdir(BASE_PATH):
+        return
+    for channel in os.scandir(BASE_PATH):
+        if not channel.is_dir() or channel.name.startswith("."):
+            continue
+        for entry in os.scandir(channel.path):
+            m = ARCHIVE_VIDEO_RE.match(entry.name)
+            if m:
+                yield m.group(2), "v", int(m.group(1)), entry.path
+                continue
+            m = ARCHIVE_AUDIO_RE.match(entry.name)
+            if m:
+                yield m.group(1), "a", 0, entry.path
+
+def rescan_archive():
+    """(Re)seed the archive from the files already present under BASE_PATH."""
+    global _archive
+    found = 0
+    with _db_lock:
+        for vid, mode, res, path in _scan_archive_files():
+            db_execute("INSERT OR REPLACE INTO archive VALUES (?, ?, ?, ?, ?)",
+                       (vid, mode, res, path, os.path.getmtime(path)))
+            found += 1
+        db_execute("INSERT OR REPLACE INTO meta VALUES ('archive_seeded', ?)", (str(time.time()),))
+        _archive = None
+    return found
+
+def _archive_index():
+    global _archive
+    with _db_lock:
+        if _archive is None:
+            if not db_execute("SELECT 1 FROM meta WHERE key = 'archive_seeded'"):
+                print(f"🗂  Seeding download archive: {rescan_archive()} existing files")
+            _archive = {}
+            for vid, mode, res, path in db_execute("SELECT video_id, mode, resolution, path FROM archive"):
+                _archive.setdefault(vid, {})[(mode, res)] = path
+        return _archive
+
+def archive_hit(vid, mode, resolution=None, max_height=None):
+    """Path of an existing download of this video, answered without any network call.
+
+    resolution=None matches any resolution (capped by max_height); audio ignores both.
+    """
+    with _db_lock:
+        entries = dict(_archive_index().get(vid, {}))
+    for (m, res), path in sorted(entries.items(), key=lambda e: -e[0][1]):
+        if m != mode:
+            continue
+        if mode == "v" and resolution and res != resolution:
+            continue
+        if mode == "v" and max_height and res > max_height:
+            continue
+        if os.path.exists(path):
+            return path
+        archive_remove(vid, m, res)  # file was deleted/moved since
+    return None
+
+def archive_add(vid, mode, resolution, path):
+    if not path:
+        return
+    resolution = int(resolution or 0) if mode == "v" else 0
+    with _db_lock:
+        db_execute("INSERT OR REPLACE INTO archive VALUES (?, ?, ?, ?, ?)",
+                   (vid, mode, resolution, path, time.time()))
+        _archive_index().setdefault(vid, {})[(mode, resolution)] = path
+        if mode == "v":
+            db_execute("UPDATE channel_videos SET max_height = MAX(COALESCE(max_height, 0), ?) WHERE video_id = ?",
+                       (resolution, vid))
+
+def archive_remove(vid, mode, resolution):
+    with _db_lock:
+        db_execute("DELETE FROM archive WHERE video_id = ? AND mode = ? AND resolution = ?", (vid, mode, resolution))
+        _archive_index().get(vid, {}).pop((mode, resolution), None)
+
+# Job journal: which stages of an unfinished job already completed
+def job_key(vid, mode, resolution=None):
+    return f"{vid}:{mode}:{resolution or 'best'}"
+
+def journal_stages(key):
+    return {row[0] for row in db_execute("SELECT stage FROM journal WHERE job_key = ?", (key,))}
+
+def journal_mark(key, stage):
+    db_execute("INSERT OR REPLACE INTO journal VALUES (?, ?, ?)", (key, stage, time.time()))
+
+def journal_clear(key):
+    with _db_lock:
+        if db_execute("SELECT 1 FROM jobs WHERE job_key = ? AND host != ?", (key, socket.gethostname())):
+            return   # a run on another host has taken the job over since
+        db_execute("DELETE FROM journal WHERE job_key = ?", (key,))
+        db_execute("DELETE FROM jobs WHERE job_key = ?", (key,))
+
+def is_collection_url(url):
+    """True for channel/playlist URLs (anything without a single video ID)."""
+    return video_id(url) is None
+
+def iter_entries(url, limit=None):
+    """Lazily yield flat entries (id, url, title, duration …) of a channel or playlist.
+
+    Pages are fetched from YouTube only as the generator is consumed, and nothing
+    is extracted per video – call get_info() on an entry right before downloading it.
+    """
+    # Pages are fetched lazily, outside with_retries(): keep yt-dlp's own retries here
+    with ydl_session({"quiet": True, "extract_flat": "in_playlist", "lazy_playlist": True,
+                      "extractor_retries": 3}) as ydl:
+        count = 0
+        pending = [url]
+        while pending:
+            result = ydl.extract_info(pending.pop(0), download=False, process=False)
+            # Channel pages resolve through url results (e.g. @handle -> /videos tab)
+            while result.get("_type") in ("url", "url_transparent") and is_collection_url(result["url"]):
+                result = ydl.extract_info(result["url"], download=False, process=False)
+            if result.get("_type") not in ("playlist", "multi_video"):
+                yield result
+                count += 1
+                continue
+
+            for entry in result.get("entries") or []:
+                if entry is None:
+                    continue
+                entry_url = entry.get("url") or entry.get("webpage_url") or entry.get("id")
+                if entry.get("_type") == "playlist" or (entry_url and is_collection_url(entry_url)):
+                    pending.append(entry_url)  # nested tab/playlist, enumerate after this one
+                    continue
+                entry["url"] = normalize_url(entry_url)
+                yield entry
+                count += 1
+                if limit and count >= limit:
+                    return
+
+def pick_resolution(info, max_height=None):
+    """Best available resolution, capped at max_height (None = best overall)."""
+    resolutions = [r for r in list_resolutions(info) if not max_height or r <= max_height]
+    return resolutions[-1] if resolutions else None
+
+# ------------------------------------------------------------------
+# Multi-connection downloads (adaptive number of fragment connections)
+# ------------------------------------------------------------------
+_per_connection_bps = None      # smoothed throughput of one connection, bytes/s
+_active_streams = 0
+_fragment_lock = threading.Lock()
+
+def observe_connection_throughput(size, elapsed, connections):
+    """Feed one finished download into the per-connection throughput estimate."""
+    global _per_connection_bps
+    if size < 8 * 1048576:
+        return  # small files are dominated by latency, not by the per-connection cap
+    sample = size / elapsed / max(connections, 1)
+    with _fragment_lock:
+        current = _per_connection_bps or sample
+        _per_connection_bps = 0.7 * current + 0.3 * sample
+        db_execute("INSERT OR REPLACE INTO meta VALUES ('per_connection_bps', ?)", (str(_per_connection_bps),))
+
+def fragment_connections():
+    """Connections for the next stream: enough to fill BANDWIDTH_MBPS, shared by active streams."""
+    global _per_connection_bps
+    if FRAGMENT_CONNECTIONS != "auto":
+        return max(1, int(FRAGMENT_CONNECTIONS))
+    with _fragment_lock:
+        if _per_connection_bps is None:
+            rows = db_execute("SELECT value FROM meta WHERE key = 'per_connection_bps'")
+            _per_connection_bps = float(rows[0][0]) if rows else 2 * 1048576
+        link_bps = BANDWIDTH_MBPS * 1e6 / 8
+        wanted = math.ceil(link_bps / _per_connection_bps / max(_active_streams, 1))
+    return max(1, min(MAX_FRAGMENT_CONNECTIONS, wanted))
+
+@contextlib.contextmanager
+def _counted_stream():
+    global _active_streams
+    with _fragment_lock:
+        _active_streams += 1
+    try:
+        yield
+    finally:
+        with _fragment_lock:
+            _active_streams -= 1
+
+def download_from_info(ydl_opts, url, info=None, workdir=None):
+    """Download using an already probed info dict instead of re-extracting the URL.
+
+    Relative output templates are resolved inside workdir (the job workspace).
+    """
+    if info is None:
+        info = get_info(url)
+    paths = {"home": workdir} if workdir else None
+    current = {"info": info}
+
+    def attempt():
+        # Slots are held per attempt only, never while backing off; the network slot
+        # is handed back as soon as yt-dlp starts postprocessing
+        NET_SLOTS.acquire()
+        _job_local.net_slot = True
+        try:
+            with _counted_stream():
+                connections = fragment_connections()
+                params = {"concurrent_fragment_downloads": connections}
+                with ydl_session(ydl_opts, paths, params) as ydl, \
+                        timed_stage("fetch", connections=connections):
+                    return ydl.process_ie_result(copy.deepcopy(current["info"]), download=True)
+        finally:
+            _release_pp_slot()   # a failing postprocessor never reports "finished"
+            _release_net_slot()
+
+    def refresh(error_class):
+        if error_class == "forbidden":   # stream URLs expired or were rejected – probe again
+            current["info"] = get_info(url, refresh=True)
+
+    stream_url = info.get("url") or next((f["url"] for f in info.get("formats") or [] if f.get("url")), None)
+    return with_retries(attempt, host_key(stream_url), "fetch", on_retry=refresh)
+
+def downloaded_file(result):
+    """Final file path of a process_ie_result() download, if yt-dlp reported one."""
+    downloads = (result or {}).get("requested_downloads") or [{}]
+    return downloads[-1].get("filepath") or (result or {}).get("filepath")
+
+# ------------------------------------------------------------------
+# Format selection
+# ------------------------------------------------------------------
+# Relative decode cost per source codec family (AV1 is the most expensive to decode)
+DECODE_FACTOR = {"h264": 0.5, "hevc": 0.8, "vp9": 1.0, "av1": 1.5}
+HW_SPEEDUP = 4
+
+def codec_family(vcodec):
+    vcodec = (vcodec or "").lower()
+    for prefix, family in (("avc1", "h264"), ("h264", "h264"), ("hev1", "hevc"), ("hvc1", "hevc"),
+                           ("vp09", "vp9"), ("vp9", "vp9"), ("av01", "av1")):
+        if vcodec.startswith(prefix):
+            return family
+    return vcodec.split(".")[0] or "unknown"
+
+class FormatIndex:
+    """Video formats of one info dict, indexed by height, codec family and container.
+
+    Built once per info dict (see format_index()); picks the format with the lowest
+    estimated time-to-finished-file = download time + transcode time.
+    """
+
+    def __init__(self, info):
+        self.duration = info.get("duration") or 0
+        self.by_height = collections.defaultdict(list)
+        self.by_codec = collections.defaultdict(list)
+        self.by_container = collections.defaultdict(list)
+        self.audio = []   # audio-only formats, worst to best (yt-dlp's order)
+        for f in info.get("formats") or []:
+            if f.get("vcodec") == "none" and f.get("acodec") not in (None, "none"):
+                self.audio.append(f)
+            if f.get("vcodec") in (None, "none") or not f.get("height"):
+                continue
+            self.by_height[f["height"]].append(f)
+            self.by_codec[codec_family(f.get("vcodec"))].append(f)
+            self.by_container[f.get("ext")].append(f)
+
+    def heights(self):
+        """Sorted resolutions that have an mp4 or webm video stream."""
+        return sorted({f["height"] for ext in ("mp4", "webm") for f in self.by_container[ext]})
+
+    def estimate_size(self, fmt):
+        """(bytes, source) – exact filesize, yt-dlp's approximation, or tbr × duration."""
+        if fmt.get("filesize"):
+            return fmt["filesize"], "filesize"
+        if fmt.get("filesize_approx"):
+            return fmt["filesize_approx"], "approx"
+        if fmt.get("tbr") and self.duration:
+            return int(fmt["tbr"] * 1000 / 8 * self.duration), "tbr"
+        return None, "unknown"
+
+    def transcode_seconds(self, fmt):
+        """Expected ffmpeg time for this source in the path download_video() would take."""
+        family = codec_family(fmt.get("vcodec"))
+        if fmt["height"] <= 1080:
+            mode = "remux" if family == "h264" else "reencode"   # avc1 is used natively, else fallback recode
+        else:
+            mode = select_output_mode(fmt.get("vcodec"))
+        if mode == "remux" or not self.duration:
+            return 0.0
+        pixels = fmt["height"] * (fmt.get("width") or fmt["height"] * 16 // 9) * (fmt.get("fps") or 30)
+        seconds = self.duration * pixels / ENCODE_PIXELS_PER_S * DECODE_FACTOR.get(family, 1.0)
+        return seconds / HW_SPEEDUP if mode == "hw" else seconds
+
+    def cost(self, fmt):
+        size, _ = self.estimate_size(fmt)
+        download = size * 8 / (BANDWIDTH_MBPS * 1e6) if size else float("inf")
+        return download + self.transcode_seconds(fmt)
+
+    def best(self, height):
+        """Cheapest video format at exactly this height, or None."""
+        candidates = self.by_height.get(height) or []
+        if height <= 1080:
+            # the ≤1080p path downloads avc1 natively whenever it exists
+            candidates = [f for f in candidates if codec_family(f.get("vcodec")) == "h264"] or candidates
+        return min(candidates, key=self.cost, default=None)
+
+    def best_audio(self, m4a=True):
+        """The format "bestaudio[ext=m4a]/bestaudio" (or "bestaudio" with m4a=False) selects, or None."""
+        preferred = [f for f in self.audio if f.get("ext") == "m4a"] if m4a else []
+        candidates = preferred or self.audio
+        return candidates[-1] if candidates else None
+
+    def describe(self, height):
+        """Menu text for one resolution: codec, size and where the estimate comes from."""
+        fmt = self.best(height)
+        size, source = self.estimate_size(fmt)
+        size_text = f"~{size / 1048576:,.0f} MiB ({source})" if size else "size unknown"
+        total = self.cost(fmt)
+        eta = f", ~{format_seconds(total)} to file" if total != float("inf") else ""
+        return f"{codec_family(fmt.get('vcodec')):<5} {fmt.get('ext', '?'):<5} {size_text}{eta}"
+
+_format_indexes = collections.OrderedDict()
+_format_index_lock = threading.Lock()
+
+def format_index(info):
+    """FormatIndex for an info dict, built once and kept while the dict is in use."""
+    key = (info.get("id"), id(info))
+    with _format_index_lock:
+        cached_info, index = _format_indexes.get(key, (None, None))
+        # id() is reused once a dict is freed: the entry keeps its dict to tell them apart
+        if cached_info is not info:
+            index = FormatIndex(info)
+            _format_indexes[key] = (info, index)
+            while len(_format_indexes) > INFO_CACHE_SIZE:
+                _format_indexes.popitem(last=False)
+        return index
 
 def list_resolutions(info):
     """Return sorted available video resolutions (include mp4 and webm)."""
-    formats = info.get("formats", [])
-    video_streams = [
-        f for f in formats
-        if f.get("vcodec") != "none" and f.get("height") and f.get("ext") in ["mp4", "webm"]
-    ]
-    return sorted({f["height"] for f in video_streams})
+    return format_index(info).heights()
 
 def format_seconds(seconds):
     """Return human‑readable duration string (HH:MM:SS or MM:SS)."""
@@ -83,128 +1298,618 @@ def print_video_info(info, selected_res=None):
     print("===========================\n")
     print("Channel Folder: " + BASE_PATH + "/" + clean_string_regex(info['channel']) + "\n")
 
+def _fetch_stream(job, label, *args):
+    with job_context(job, label):
+        return download_from_info(*args)
+
+def fetch_streams(url, info, jobs, workdir=None, on_done=None):
+    """Download several formats of one video concurrently.
+
+    jobs maps a label (e.g. "video", "audio") to the yt-dlp options for that stream;
+    each stream shows up separately in the live status line.
+    on_done(label) is called for every stream that finished.
+    Returns once every stream finished; the first failure is re-raised.
+    """
+    with concurrent.futures.ThreadPoolExecutor(max_workers=len(jobs)) as pool:
+        futures = {
+            pool.submit(_fetch_stream, current_job(), label, {**opts, "quiet": True}, url, info, workdir): label
+            for label, opts in jobs.items()
+        }
+        for future in concurrent.futures.as_completed(futures):
+            future.result()
+            if on_done:
+                on_done(futures[future])
+
+# ------------------------------------------------------------------
+# ffmpeg helpers
+# ------------------------------------------------------------------
+HW_ENCODERS = ["h264_qsv", "h264_vaapi"]    # in order of preference
+VAAPI_DEVICE = config.get("vaapi_device", "/dev/dri/renderD128")
+MP4_VIDEO_CODECS = ("avc1", "h264", "hev1", "hvc1", "vp09", "vp9", "av01")
+MP4_AUDIO_CODECS = ("mp4a", "aac", "opus", "mp3")
+
+_hw_encoder = False  # False = not probed yet
+
+def detect_hw_encoder():
+    """Return the first usable hardware H.264 encoder known to ffmpeg, or None."""
+    global _hw_encoder
+    if _hw_encoder is False:
+        _hw_encoder = None
+        try:
+            out = subprocess.run(["ffmpeg", "-hide_banner", "-encoders"],
+                                 capture_output=True, text=True, check=True).stdout
+        except (OSError, subprocess.CalledProcessError):
+            return None
+        for enc in HW_ENCODERS:
+            if re.search(rf"\s{enc}\s", out):
+                if enc == "h264_vaapi" and not os.path.exists(VAAPI_DEVICE):
+                    continue
+                _hw_encoder = enc
+                break
+    return _hw_encoder
+
+def select_output_mode(vcodec):
+    """Pick the cheapest merge mode that satisfies COMPAT_TARGET for this video codec."""
+    if OUTPUT_MODE != "auto":
+        return OUTPUT_MODE
+    if COMPAT_TARGET == "any" or (vcodec or "").startswith(("avc1", "h264")):
+        return "remux"
+    return "hw" if detect_hw_encoder() else "reencode"
+
+def output_extension(mode, vcodec, acodec):
+    """MP4 when the container can hold the streams, MKV otherwise (remux only)."""
+    if mode != "remux":
+        return "mp4"
+    if (vcodec or "").startswith(MP4_VIDEO_CODECS) and (acodec or "").startswith(MP4_AUDIO_CODECS):
+        return "mp4"
+    return "mkv"
+
+def audio_codec_of(path):
+    """Guess the audio codec of a downloaded native bestaudio file from its extension."""
+    return {".m4a": "mp4a", ".mp4": "mp4a", ".webm": "opus", ".opus": "opus"}.get(
+        os.path.splitext(path)[1].lower(), "unknown")
+
+def audio_can_copy(acodec, final_ext):
+    """True if the native audio stream can go into the final file without transcoding."""
+    if acodec == "mp4a":
+        return True
+    return COMPAT_TARGET == "any" and (final_ext == "mkv" or acodec.startswith(MP4_AUDIO_CODECS))
+
+def merge_command(video_file, audio_file, final_file, mode, encoder=None, copy_audio=False):
+    """Build the ffmpeg command line that merges one video and one audio file.
+
+    This is the only ffmpeg pass: the audio is either stream-copied or encoded to AAC here.
+    """
+    cmd = ["ffmpeg", "-y", "-hide_banner", "-loglevel", "error", "-nostats", "-progress", "pipe:1"]
+    if encoder == "h264_vaapi":
+        cmd += ["-vaapi_device", VAAPI_DEVICE]
+    cmd += ["-i", video_file, "-i", audio_file, "-map", "0:v:0", "-map", "1:a:0"]
+
+    if mode == "remux":
+        cmd += ["-c:v", "copy"]
+    elif mode == "hw" and encoder == "h264_vaapi":
+        cmd += ["-vf", "format=nv12,hwupload", "-c:v", "h264_vaapi", "-qp", "23"]
+    elif mode == "hw" and encoder == "h264_qsv":
+        cmd += ["-c:v", "h264_qsv", "-global_quality", "23"]
+    else:
+        cmd += ["-c:v", "libx264", "-preset", "fast", "-crf", "23", "-threads", str(encoder_threads())]
+    cmd += ["-c:a", "copy"] if copy_audio else ["-c:a", "aac", "-b:a", "192k"]
+    if final_file.endswith(".mp4"):
+        cmd += ["-movflags", "+faststart"]
+    return cmd + [final_file]
+
+def audio_output(audio_file, audio_format=None):
+    """(extension, ffmpeg audio codec arguments) of an audio job; None = keep the file as it is."""
+    audio_format = audio_format or AUDIO_FORMAT
+    acodec = audio_codec_of(audio_file)
+    if audio_format == "mp3":
+        return "mp3", ["-c:a", "libmp3lame", "-b:a", "192k"]
+    if acodec == "opus":
+        return "opus", ["-c:a", "copy"]   # webm → Ogg container, no transcode
+    if audio_format == "opus":
+        return "opus", ["-c:a", "libopus", "-b:a", "128k"]
+    return os.path.splitext(audio_file)[1].lstrip("."), None   # native m4a
+
+def audio_command(audio_file, final_file, codec_args):
+    """ffmpeg command line that converts (or rewraps) one downloaded audio stream."""
+    return ["ffmpeg", "-y", "-hide_banner", "-loglevel", "error", "-nostats", "-progress", "pipe:1",
+            "-i", audio_file, "-vn", *codec_args, final_file]
+
+def run_ffmpeg(cmd, duration=None, mode=None, feed=None, slots=None):
+    """Run ffmpeg with -progress on stdout and return the last reported fps/speed.
+
+    Progress is shown in the live status line; duration (seconds) enables a percentage.
+    feed(pipe), if given, runs in a thread and writes the input read as pipe:0.
+    slots is the semaphore the run counts against (default: the video encode slots).
+    The run also takes its cores (the -threads value, else one) from CPU_CORES.
+    """
+    stats = {}
+    feed_errors = []
+    # Encode slot first, then network: a merge waiting for an encoder never holds a
+    # download slot (and nothing waits for an encode slot while holding one)
+    net = NET_SLOTS if feed else contextlib.nullcontext()
+    threads = cmd.index("-threads") + 1 if "-threads" in cmd else None
+    with slots or FFMPEG_SLOTS, CPU_CORES.take(int(cmd[threads]) if threads else 1) as cores, net, \
+            timed_stage("encode", mode=mode, streamed=bool(feed), cores=cores) as fields:
+        if threads:
+            cmd = cmd[:threads] + [str(cores)] + cmd[threads + 1:]
+        start = time.monotonic()
+        stdin = subprocess.PIPE if feed else subprocess.DEVNULL
+        with subprocess.Popen(cmd, stdin=stdin, stdout=subprocess.PIPE, text=True) as proc:
+            feeder = None
+            if feed:
+                feeder = threading.Thread(target=_run_feed, args=(current_job(), feed, proc.stdin.buffer, feed_errors))
+                feeder.start()
+            for line in proc.stdout:
+                key, _, value = line.strip().partition("=")
+                if key in ("fps", "speed", "frame", "out_time", "out_time_us"):
+                    stats[key] = value
+                elif key == "progress":   # end of one progress block
+                    done = ""
+                    if duration and stats.get("out_time_us", "").isdigit():
+                        done = f"{100 * int(stats['out_time_us']) / 1e6 / duration:5.1f}% "
+                    set_live(f"encode {done}{stats.get('fps', '?')} fps {stats.get('speed', '?').strip()}")
+            if feeder:
+                feeder.join()
+        stats["elapsed"] = time.monotonic() - start
+        fields.update(fps=stats.get("fps"), speed=stats.get("speed", "").strip() or None)
+        if feed_errors:
+            raise feed_errors[0]   # the input broke off – more useful than ffmpeg's exit code
+        if proc.returncode:
+            raise subprocess.CalledProcessError(proc.returncode, cmd)
+    return stats
+
+def _run_feed(job, feed, pipe, errors):
+    with job_context(job, "video"):
+        try:
+            feed(pipe)
+        except BrokenPipeError:
+            pass   # ffmpeg exited early; its return code tells why
+        except Exception as e:
+            errors.append(e)
+        finally:
+            try:
+                pipe.close()
+            except OSError:
+                pass
+
+STREAM_CHUNK = 10 * 1048576   # YouTube throttles single requests for whole large streams
+
+def _stream_requests(fmt):
+    """Yield (url, headers) pairs whose responses concatenate to the complete stream."""
+    headers = dict(fmt.get("http_headers") or {})
+    if fmt.get("fragments"):
+        base = fmt.get("fragment_base_url") or ""
+        for frag in fmt["fragments"]:
+            yield frag.get("url") or urllib.parse.urljoin(base, frag["path"]), headers
+    elif fmt.get("filesize"):
+        size = fmt["filesize"]
+        for start in range(0, size, STREAM_CHUNK):
+            yield fmt["url"], {**headers, "Range": f"bytes={start}-{min(start + STREAM_CHUNK, size) - 1}"}
+    else:
+        yield fmt["url"], headers
+
+def _expected_length(resp, headers):
+    """Body size a response announced (Content-Length, else the requested byte range), or None."""
+    length = resp.headers.get("Content-Length")
+    if length and length.isdigit():
+        return int(length)
+    m = re.fullmatch(r"bytes=(\d+)-(\d+)", headers.get("Range", ""))
+    return int(m.group(2)) - int(m.group(1)) + 1 if m else None
+
+def feed_stream(fmt, pipe):
+    """Download one format in order and write it into an ffmpeg stdin pipe (no temp file).
+
+    Runs inside run_ffmpeg(), which already holds a network slot for it.
+    """
+    sent = 0
+    start = time.monotonic()
+    for url, headers in _stream_requests(fmt):
+        with _session().urlopen(ytdlp().networking.Request(url, headers=headers)) as resp:
+            # A connection closed early just ends the body – without this check ffmpeg
+            # would see a normal EOF and the truncated video would be archived as done
+            expected = _expected_length(resp, headers)
+            received = 0
+            while True:
+                chunk = resp.read(1048576)
+                if not chunk:
+                    break
+                RATE_LIMITER.consume(len(chunk))
+                pipe.write(chunk)
+                received += len(chunk)
+                sent += len(chunk)
+                total = fmt.get("filesize") or fmt.get("filesize_approx")
+                pct = f"{100 * sent / total:5.1f}%" if total else f"{sent / 1048576:.0f} MiB"
+                set_live(f"stream {pct} @ {sent / 1048576 / (time.monotonic() - start):.1f} MiB/s")
+            if expected and received < expected:
+                raise ytdlp().networking.exceptions.IncompleteRead(received, expected - received)
+    if not fmt.get("fragments") and fmt.get("filesize") and sent < fmt["filesize"]:
+        raise ytdlp().networking.exceptions.IncompleteRead(sent, fmt["filesize"] - sent)
+    elapsed = time.monotonic() - start
+    emit_metric("download", stream="video", format_id=fmt.get("format_id"), bytes=sent, streamed=True,
+                seconds=round(elapsed, 3), bytes_per_s=round(sent / elapsed) if elapsed else None)
+
+def print_encode_stats(mode, stats):
+    fps = stats.get("fps", "?")
+    speed = stats.get("speed", "?").strip()
+    print(f"🎞  ffmpeg {mode}: {fps} fps, {speed} realtime, {stats['elapsed']:.1f}s")
+
+# ------------------------------------------------------------------
+# Job workspaces (scratch dirs on TEMP_PATH, atomic placement into BASE_PATH)
+# ------------------------------------------------------------------
+OWNER_FILE = "owner.lock"
+
+def _lock_file(f):
+    """Take a non-blocking exclusive lock on an open file; False if someone else holds it."""
+    try:
+        if os.name == "nt":
+            import msvcrt
+            f.seek(0)   # msvcrt locks bytes from the current position; "a+" files start at the end
+            msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return True
+    except OSError:
+        return False
+
+def _workspace_abandoned(path):
+    """True if no live process holds the workspace's owner lock (its job crashed)."""
+    try:
+        with open(os.path.join(path, OWNER_FILE), "a+") as f:
+            return _lock_file(f)   # released again when the file is closed
+    except OSError:
+        return True
+
+def _resumable(path):
+    """True if an unfinished job still points at this workspace and it is not too old."""
+    if not db_execute("SELECT 1 FROM jobs WHERE workspace = ? AND host = ?", (path, socket.gethostname())):
+        return False
+    return time.time() - os.path.getmtime(path) < RESUME_MAX_AGE
+
+def sweep_workspaces():
+    """Delete scratch directories left behind by crashed runs (unless they can be resumed)."""
+    if not os.path.isdir(TEMP_PATH):
+        return
+    for entry in os.scandir(TEMP_PATH):
+        if entry.path == STREAM_STORE:
+            continue
+        if entry.is_dir() and _workspace_abandoned(entry.path) and not _resumable(entry.path):
+            shutil.rmtree(entry.path, ignore_errors=True)
+            host = socket.gethostname()
+            db_execute("DELETE FROM journal WHERE job_key IN "
+                       "(SELECT job_key FROM jobs WHERE workspace = ? AND host = ?)", (entry.path, host))
+            db_execute("DELETE FROM jobs WHERE workspace = ? AND host = ?", (entry.path, host))
+
+def _adopt_workspace(key):
+    """Re-open the workspace of a crashed run of the same job; (path, locked owner file) or (None, None)."""
+    # Only workspaces of this host: other hosts' paths point into their own TEMP_PATH
+    rows = db_execute("SELECT workspace FROM jobs WHERE job_key = ? AND host = ?", (key, socket.gethostname()))
+    if not rows:
+        return None, None
+    path = rows[0][0]
+    if not os.path.isdir(path):
+        journal_clear(key)  # workspace is gone, so are the partial files
+        return None, None
+    owner = open(os.path.join(path, OWNER_FILE), "a+")
+    if not _lock_file(owner):
+        owner.close()       # same job is running right now elsewhere – use a fresh workspace
+        return None, None
+    owner.seek(0)
+    owner.truncate()
+    return path, owner
+
+@contextlib.contextmanager
+def job_workspace(vid, key=None):
+    """Unique scratch directory for one job, locked while the job runs.
+
+    With a job key the workspace is journaled: if the job fails or the process dies it
+    is kept and the next run of the same job resumes in it (.part files, finished stages).
+    """
+    os.makedirs(TEMP_PATH, exist_ok=True)
+    path, owner = _adopt_workspace(key) if key else (None, None)
+    if path:
+        print(f"↻ Resuming {key} (done: {', '.join(sorted(journal_stages(key))) or 'partial downloads'})")
+    else:
+        path = tempfile.mkdtemp(prefix=f"{vid}-", dir=TEMP_PATH)
+        owner = open(os.path.join(path, OWNER_FILE), "w")
+        _lock_file(owner)
+        if key:
+            with _db_lock:
+                # stages journaled for another workspace of this job don't apply to this one
+                db_execute("DELETE FROM journal WHERE job_key = ?", (key,))
+                db_execute("INSERT OR REPLACE INTO jobs (job_key, workspace, started, host) VALUES (?, ?, ?, ?)",
+                           (key, path, time.time(), socket.gethostname()))
+    json.dump({"video_id": vid, "pid": os.getpid(), "host": socket.gethostname(), "started": time.time()}, owner)
+    owner.flush()
+
+    finished = False
+    try:
+        yield path
+        finished = True
+    finally:
+        owner.close()
+        if finished or not key:
+            shutil.rmtree(path, ignore_errors=True)
+            if key:
+                journal_clear(key)
+
+def _stream_file(workdir, label):
+    """Completely downloaded stream file (e.g. video.webm) in a workspace, or None."""
+    files = [f for f in glob.glob(os.path.join(workdir, f"{label}.*")) if not f.endswith((".part", ".ytdl"))]
+    return files[0] if files else None
+
+STALE_PART_AGE = 3600   # a move's .part file untouched this long belongs to a run that died
+
+def place_file(src, dest):
+    """Move a finished file into its final location; readers never see a partial file."""
+    with timed_stage("move", bytes=os.path.getsize(src)):
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        for stale in glob.glob(glob.escape(dest) + ".*.part"):
+            try:
+                if time.time() - os.path.getmtime(stale) > STALE_PART_AGE:
+                    os.remove(stale)   # an earlier run of this job died during its move
+            except OSError:
+                pass
+        tmp = f"{dest}.{uuid.uuid4().hex[:8]}.part"
+        shutil.move(src, tmp)       # may be a slow copy across disks/NAS …
+        os.replace(tmp, dest)       # … but the final rename is atomic
+    return dest
+
+def place_download(path, workdir, output_path):
+    """Place a file yt-dlp wrote inside workdir at the same relative path under output_path."""
+    if not path:
+        return None
+    return place_file(path, os.path.join(output_path, os.path.relpath(path, workdir)))
+
+# ------------------------------------------------------------------
+# Stream store (raw streams shared between jobs, keyed by video ID + format)
+# ------------------------------------------------------------------
+_store_lock = threading.Lock()
+
+def _store_path(vid, fmt):
+    return os.path.join(STREAM_STORE, f"{vid}.{fmt['format_id']}.{fmt.get('ext') or 'bin'}")
+
+def _link_or_copy(src, dest):
+    try:
+        os.link(src, dest)           # same disk: no copy, the data is shared
+    except OSError:
+        shutil.copyfile(src, dest)   # other filesystem or no hardlink support
+
+def store_link(vid, fmt, dest):
+    """Link a stored stream to dest; False if it is not in the store."""
+    src = _store_path(vid, fmt)
+    with _store_lock:
+        if not STREAM_STORE_BYTES or not os.path.exists(src):
+            return False
+        os.utime(src)   # mtime = last use, for the LRU eviction
+        _link_or_copy(src, dest)
+    return True
+
+def store_put(vid, fmt, path):
+    """Add a finished stream file to the store and evict the least recently used beyond the size limit."""
+    if not STREAM_STORE_BYTES or not path:
+        return
+    dest = _store_path(vid, fmt)
+    with _store_lock:
+        os.makedirs(STREAM_STORE, exist_ok=True)
+        tmp = f"{dest}.{uuid.uuid4().hex[:8]}.part"
+        _link_or_copy(path, tmp)
+        os.replace(tmp, dest)
+        entries = []
+        for entry in os.scandir(STREAM_STORE):
+            if entry.is_file() and not entry.name.endswith(".part"):
+                st = entry.stat()
+                entries.append((st.st_mtime, st.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, old in sorted(entries):
+            if total <= STREAM_STORE_BYTES:
+                break
+            with contextlib.suppress(FileNotFoundError):   # another process evicted it first
+                os.remove(old)
+            total -= size
+
+def fetch_stored(url, info, formats, workdir, on_done=None):
+    """Fetch single formats (label -> format dict) into workdir as <label>.<ext>.
+
+    Streams already in the store are linked instead of downloaded; the others are
+    downloaded concurrently (see fetch_streams) and added to the store.
+    """
+    jobs = {}
+    for label, fmt in formats.items():
+        if store_link(info["id"], fmt, os.path.join(workdir, f"{label}.{fmt.get('ext')}")):
+            print(f"♻ {label} stream {fmt['format_id']} reused from the stream store")
+            emit_metric("store_hit", stream=label, format_id=fmt["format_id"])
+            if on_done:
+                on_done(label)
+        else:
+            jobs[label] = {"format": fmt["format_id"], "outtmpl": f"{label}.%(ext)s", "sanitize_info": sanitize_info}
+
+    def stored(label):
+        store_put(info["id"], formats[label], _stream_file(workdir, label))
+        if on_done:
+            on_done(label)
+    if jobs:
+        fetch_streams(url, info, jobs, workdir, on_done=stored)
+
 # ------------------------------------------------------------------
 # Download functions
 # ------------------------------------------------------------------
+@instrumented_job("a")
 def download_audio(url, output_path=BASE_PATH):
-    def sanitize(info, _):
-        info["title"] = clean_string_regex(info["title"])
-        info["channel"] = clean_string_regex(info.get("channel") or info.get("uploader") or "UnknownChannel")
-        return info
+    vid = video_id(url)
+    hit = vid and archive_hit(vid, "a")
+    if hit:
+        print(f"⏭  Already downloaded: {hit}")
+        return hit
 
     info = get_info(url)
     print_video_info(info)   # ← new line
 
-    ydl_opts = {
-        "format": "bestaudio[ext=m4a]/bestaudio",
-        "outtmpl": os.path.join(
-            output_path,
-            "%(channel)s",
-            "%(upload_date>%Y-%m-%d)s-%(title)s-%(id)s.%(ext)s"
-        ),
-        "postprocessors": [{"key": "FFmpegExtractAudio", "preferredcodec": "mp3", "preferredquality": "192"}],
-        "sanitize_info": sanitize,
-        "extractor_args": {"youtube": {"player_client": "web"}},
-        "cookiesfrombrowser": ("firefox",),
-    }
+    # Same format as "bestaudio[ext=m4a]/bestaudio" (plain bestaudio for opus); fetched through
+    # the stream store so the high-res merge of this video (or a later audio run) can reuse it
+    audio_fmt = format_index(info).best_audio(m4a=AUDIO_FORMAT != "opus")
+    if not audio_fmt:
+        raise RuntimeError("No audio-only stream available")
     os.makedirs(output_path, exist_ok=True)
-    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-        ydl.download([url])
+    key = job_key(info["id"], "a")
+    with job_workspace(info["id"], key) as work:
+        if "audio" not in journal_stages(key) or not _stream_file(work, "audio"):
+            fetch_stored(url, info, {"audio": audio_fmt}, work, on_done=lambda label: journal_mark(key, label))
+        audio_file = _stream_file(work, "audio")
+        ext, codec_args = audio_output(audio_file)
+        if codec_args:
+            # Encoders have their own slots (one core each), so fetches and encodes of a batch overlap
+            out_file = os.path.join(work, f"converted.{ext}")
+            run_ffmpeg(audio_command(audio_file, out_file, codec_args), info.get("duration"), ext, slots=AUDIO_SLOTS)
+        else:
+            out_file = audio_file
+        # Same names as before the stream store: yt-dlp's template, sanitized the way yt-dlp does
+        outtmpl = os.path.join("%(channel)s", "%(upload_date>%Y-%m-%d)s-%(title)s-%(id)s.%(ext)s")
+        with ydl_session({"quiet": True, "outtmpl": outtmpl}) as ydl:
+            name = ydl.prepare_filename({**info, "ext": ext})
+        path = place_file(out_file, os.path.join(output_path, name))
+    archive_add(info["id"], "a", 0, path)
+    return path
+
+@instrumented_job("v")
+def download_video(url, resolution=None, output_path=BASE_PATH, max_height=None):
+    """Download video, merge high‑res video + native audio into MP4 H.264 + AAC (or remux)
+
+    max_height picks the best resolution up to that height when no resolution is given.
+    """
+    vid = video_id(url)
+    hit = vid and archive_hit(vid, "v", resolution, max_height)
+    if hit:
+        print(f"⏭  Already downloaded: {hit}")
+        return hit
 
-def download_video(url, resolution=None, output_path=BASE_PATH):
-    """Download video, merge high‑res webm+opus into MP4 H.264 + AAC"""
     info = get_info(url)
-    formats = info.get("formats", [])
+    if max_height and not resolution:
+        resolution = pick_resolution(info, max_height)
 
     os.makedirs(output_path, exist_ok=True)
 
-    def sanitize(info, _):
-        info["title"] = clean_string_regex(info["title"])
-        info["channel"] = clean_string_regex(info.get("channel") or info.get("uploader") or "UnknownChannel")
-        return info
-
     print_video_info(info, selected_res=resolution)  # ← new line
 
     if resolution and resolution > 1080:
         # High‑res workflow
-        video_fmt = next((f for f in formats if f.get("height") == resolution and f.get("vcodec") != "none"), None)
+        # Cheapest stream at this height: download size + cost of the transcode it needs
+        video_fmt = format_index(info).best(resolution)
         if not video_fmt:
             print("❌ Requested resolution not found, using best video")
             fmt_vid = "bestvideo+bestaudio/best"
-            output_file = os.path.join(output_path, "%(title)s.%(ext)s")
-            with yt_dlp.YoutubeDL({
-                "format": fmt_vid,
-                "outtmpl": output_file,
-                "extractor_args": {"youtube": {"player_client": "web"}},
-                "sanitize_info": sanitize,
-                "cookiesfrombrowser": ("firefox",),
-            }) as ydl:
-                ydl.download([url])
-            return
-
-        # Temporary file paths (no extension; yt-dlp will add .webm/.opus)
-        video_path_base = os.path.join(output_path, "temp_video.webm")
-        audio_path_base = os.path.join(output_path, "temp_audio")
+            with job_workspace(info["id"], job_key(info["id"], "v")) as work:
+                result = download_from_info({
+                    "format": fmt_vid,
+                    "outtmpl": "%(title)s.%(ext)s",
+                    "sanitize_info": sanitize_info,
+                }, url, info, work)
+                path = place_download(downloaded_file(result), work, output_path)
+            archive_add(info["id"], "v", result.get("height"), path)
+            return path
 
         upload_date = info.get('upload_date', 'unknown')
         if upload_date != 'unknown' and len(upload_date) == 8:
             upload_date = f"{upload_date[:4]}-{upload_date[4:6]}-{upload_date[6:]}"
 
-        final_file = os.path.join(
+        # Streams are fetched first; the output container depends on the merge mode
+        final_base = os.path.join(
             output_path,
             clean_string_regex(info['channel']),
-            f"{upload_date} - {resolution}p - {clean_string_regex(info['title'])} - {info['id']}.mp4"
+            f"{upload_date} - {resolution}p - {clean_string_regex(info['title'])} - {info['id']}"
         )
-        os.makedirs(os.path.dirname(final_file), exist_ok=True)
-
-        # Download video only
-        with yt_dlp.YoutubeDL({
-            "format": f"{video_fmt['format_id']}",
-            "outtmpl": video_path_base,
-            "extractor_args": {"youtube": {"player_client": "web"}},
-            "sanitize_info": sanitize,
-            "cookiesfrombrowser": ("firefox",),
-        }) as ydl:
-            ydl.download([url])
-
-        # Download audio only as opus
-        with yt_dlp.YoutubeDL({
-            "format": "bestaudio",
-            "outtmpl": audio_path_base,
-            "postprocessors": [{"key": "FFmpegExtractAudio", "preferredcodec": "opus"}],
-            "extractor_args": {"youtube": {"player_client": "web"}},
-            "sanitize_info": sanitize,
-            "cookiesfrombrowser": ("firefox",),
-        }) as ydl:
-            ydl.download([url])
-
-        # Detect actual audio file generated by yt-dlp
-        audio_files = glob.glob(audio_path_base + ".*")
-        if not audio_files:
-            raise FileNotFoundError("Audio file not found after download")
-        audio_file = audio_files[0]
-
-        # Merge and re-encode into MP4 H.264 + AAC
-        subprocess.run([
-            "ffmpeg", "-y",
-            "-i", video_path_base,
-            "-i", audio_file,
-            "-c:v", "libx264",
-            "-preset", "fast",
-            "-crf", "23",
-            "-c:a", "aac",
-            "-b:a", "192k",
-            final_file
-        ], check=True)
-
-        # Remove temp files
-        try:
-            os.remove(video_path_base)
-            os.remove(audio_file)
-        except FileNotFoundError:
-            pass
+
+        # Merge mode decides which audio source is cheapest: AAC (m4a) can always be
+        # copied, opus only when the compatibility target allows it
+        mode = select_output_mode(video_fmt.get("vcodec"))
+        encoder = detect_hw_encoder() if mode == "hw" else None
+        if mode == "hw" and not encoder:
+            print("⤵ No VAAPI/QSV encoder found, falling back to libx264")
+            mode = "reencode"
+        audio_fmt = format_index(info).best_audio(m4a=COMPAT_TARGET != "any")
+        if not audio_fmt:
+            raise RuntimeError("No audio-only stream available")
+
+        key = job_key(info["id"], "v", resolution)
+        with job_workspace(info["id"], key) as work:
+            # Stages finished by an interrupted earlier run are skipped
+            done = journal_stages(key)
+            for label in ("video", "audio"):
+                if label in done and not _stream_file(work, label):
+                    done.discard(label)  # journaled, but the file is missing
+
+            # An earlier run died after placing the merged file but before archiving it
+            placed = [p for p in glob.glob(glob.escape(final_base) + ".*") if not p.endswith(".part")]
+            if "merged" in done and placed:
+                archive_add(info["id"], "v", resolution, placed[0])
+                print(f"✅ Video already merged to {placed[0]}")
+                return placed[0]
+
+            streams = {}
+            # In stream_encode mode the video is never stored: it is piped into the merge below
+            if "merged" not in done and "video" not in done and not STREAM_ENCODE:
+                streams["video"] = video_fmt
+            if "merged" not in done and "audio" not in done:
+                streams["audio"] = audio_fmt
+            # Download video only and native audio only in parallel (no audio postprocessing),
+            # or link them from the stream store; yt-dlp continues .part files on resume.
+            if streams:
+                fetch_stored(url, info, streams, work, on_done=lambda label: journal_mark(key, label))
+
+            merged_files = glob.glob(os.path.join(work, "merged.*"))
+            if "merged" in done and merged_files:
+                merged_file = merged_files[0]
+                print("↻ Merge already done, only moving the file")
+            else:
+                # Detect actual files generated by yt-dlp
+                video_file, audio_file = _stream_file(work, "video"), _stream_file(work, "audio")
+                if STREAM_ENCODE:
+                    video_file = "pipe:0"
+                if not video_file or not audio_file:
+                    raise FileNotFoundError("Video or audio stream not found after download")
+                acodec = audio_codec_of(audio_file)
+
+                # Single ffmpeg pass: stream copy, hardware or libx264 encode
+                final_ext = output_extension(mode, video_fmt.get("vcodec"), acodec)
+                merged_file = os.path.join(work, f"merged.{final_ext}")
+                copy_audio = audio_can_copy(acodec, final_ext)
+
+                duration = info.get("duration")
+                current = {"video": video_fmt, "mode": mode}
+
+                def merge():
+                    feed = functools.partial(feed_stream, current["video"]) if STREAM_ENCODE else None
+                    try:
+                        return run_ffmpeg(merge_command(video_file, audio_file, merged_file, current["mode"], encoder,
+                                                        copy_audio), duration, current["mode"], feed)
+                    except subprocess.CalledProcessError:
+                        if current["mode"] != "hw":
+                            raise
+                    print(f"⤵ {encoder} failed, falling back to libx264")
+                    current["mode"] = "reencode"
+                    return run_ffmpeg(merge_command(video_file, audio_file, merged_file, "reencode", copy_audio=copy_audio),
+                                      duration, "reencode", feed)
+
+                def refresh(error_class):
+                    if error_class == "forbidden":   # stream URLs expired or were rejected – probe again
+                        current["video"] = format_index(get_info(url, refresh=True)).best(resolution) or current["video"]
+
+                if STREAM_ENCODE:
+                    # The video is read from the network during the merge, so retry it like a fetch
+                    stats = with_retries(merge, host_key(video_fmt.get("url")), "stream", on_retry=refresh)
+                else:
+                    stats = merge()
+                mode = current["mode"]
+                print_encode_stats(mode, stats)
+                journal_mark(key, "merged")
+
+            # Atomic move into the channel folder; the workspace (temp streams) is removed
+            final_file = place_file(merged_file, final_base + os.path.splitext(merged_file)[1])
+            archive_add(info["id"], "v", resolution, final_file)
 
         print(f"✅ Video downloaded and merged to {final_file}")
+        return final_file
 
     else:
         # ≤1080p workflow – native H.264 MP4 (avc1) when available
@@ -214,7 +1919,6 @@ def download_video(url, resolution=None, output_path=BASE_PATH):
             fmt_avc = "bestvideo[ext=mp4][vcodec^=avc1]+bestaudio[ext=m4a]/best[ext=mp4][vcodec^=avc1]"
 
         outtmpl = os.path.join(
-            output_path,
             "%(channel)s",
             "%(upload_date>%Y-%m-%d)s - %(height)sp - %(title)s - %(id)s.%(ext)s"
         )
@@ -223,33 +1927,632 @@ def download_video(url, resolution=None, output_path=BASE_PATH):
             "format": fmt_avc,
             "outtmpl": outtmpl,
             "merge_output_format": "mp4",
-            "sanitize_info": sanitize,
-            "extractor_args": {"youtube": {"player_client": "web"}},
-            "cookiesfrombrowser": ("firefox",),
+            "sanitize_info": sanitize_info,
         }
 
-        # Try to download the avc1 MP4 stream first
+        with job_workspace(info["id"], job_key(info["id"], "v", resolution)) as work:
+            # Try to download the avc1 MP4 stream first
+            try:
+                result = download_from_info(ydl_opts, url, info, work)
+            except Exception as e:
+                # Only a real format miss falls back; transient errors were already retried
+                if classify_error(e) != "format":
+                    raise
+                # Fallback to re‑encode if avc1 not available
+                print("⤵ Fallback: AVC1 stream unavailable, downloading best and re‑encoding to H.264. Reason:", e)
+
+                ydl_opts_fallback = {
+                    "format": "bestvideo+bestaudio/best",
+                    "outtmpl": outtmpl,
+                    "merge_output_format": "mp4",
+                    "recode-video": "mp4",
+                    "sanitize_info": sanitize_info,
+                }
+
+                result = download_from_info(ydl_opts_fallback, url, info, work)
+
+            # Atomic move from the workspace into the channel folder
+            path = place_download(downloaded_file(result), work, output_path)
+
+        archive_add(info["id"], "v", result.get("height") or resolution, path)
+        print(f"✅ Video downloaded to {path}")
+        return path
+
+def download_collection(url, mode="v", max_height=None, limit=None):
+    """Download every video of a channel/playlist, probing each one only when it is its turn."""
+    if mode == "a" and not limit:
+        # Albums/playlists as audio: concurrent fetches feeding the audio encoder slots
+        return run_jobs([{"url": url, "mode": "a", "resolution": None}])
+    done = failed = 0
+    for entry in iter_entries(url, limit=limit):
+        print(f"\n▶ {done + failed + 1}: {entry.get('title') or entry['url']}")
         try:
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                ydl.download([url])
+            if mode == "a":
+                download_audio(entry["url"])
+            else:
+                download_video(entry["url"], max_height=max_height)
+            done += 1
         except Exception as e:
-            # Fallback to re‑encode if avc1 not available
-            print("⤵ Fallback: AVC1 stream unavailable or failed, downloading best and re‑encoding to H.264. Reason:", e)
+            failed += 1
+            print(f"❌ {entry['url']}: {e}")
+    print(f"✅ Channel/playlist finished: {done} downloaded, {failed} failed")
+
+# ------------------------------------------------------------------
+# Batch mode
+# ------------------------------------------------------------------
+def parse_batch_line(line, default_mode="v", default_res=None):
+    """Parse one batch job: `URL [a|v] [resolution]` or a JSON object with url/mode/resolution."""
+    line = line.strip()
+    if not line or line.startswith("#"):
+        return None
+    if line.startswith("{"):
+        job = json.loads(line)
+    else:
+        parts = line.split()
+        job = {"url": parts[0]}
+        for part in parts[1:]:
+            if part.lower() in ("a", "v"):
+                job["mode"] = part.lower()
+            else:
+                job["resolution"] = part
+    res = job.get("resolution", default_res)
+    res = str(res).lower().rstrip("p") if res is not None else "best"
+    return {
+        "url": normalize_url(job["url"]),
+        "mode": job.get("mode", default_mode),
+        "resolution": int(res) if res.isdigit() else None,
+    }
+
+def expand_jobs(jobs):
+    """Yield video jobs, enumerating channel/playlist jobs lazily (resolution acts as a cap)."""
+    for job in jobs:
+        if not is_collection_url(job["url"]):
+            yield job
+            continue
+        try:
+            for entry in iter_entries(job["url"]):
+                yield dict(job, url=entry["url"], max_height=job["resolution"], resolution=None)
+        except Exception as e:
+            yield dict(job, error=f"channel/playlist enumeration failed: {e}")
+
+def run_job(job):
+    """Run one batch job and return its result record (never raises)."""
+    record = dict(job, status="ok", error=None, file=None, bytes=0)
+    start = time.monotonic()
+    try:
+        if job.get("error"):
+            raise RuntimeError(job["error"])
+        if job["mode"] == "a":
+            record["file"] = download_audio(job["url"])
+        else:
+            record["file"] = download_video(job["url"], resolution=job["resolution"],
+                                            max_height=job.get("max_height"))
+        if record["file"] and os.path.exists(record["file"]):
+            record["bytes"] = os.path.getsize(record["file"])
+    except Exception as e:
+        record["status"] = "failed"
+        record["error"] = f"{type(e).__name__}: {e}"
+        record["error_class"] = classify_error(e)
+        print(f"❌ {job['url']}: {record['error']}")
+    record["seconds"] = round(time.monotonic() - start, 2)
+    _record_channel_result(record)
+    return record
+
+def _record_channel_result(record):
+    """Count failures of channel-indexed videos in a row, so --sync backs off from them."""
+    vid = video_id(record["url"])
+    if not vid:
+        return
+    if record["status"] == "ok":
+        db_execute("UPDATE channel_videos SET failures = 0, last_error = NULL WHERE video_id = ? AND failures > 0",
+                   (vid,))
+    elif record.get("error_class") not in ("network", "throttled", "forbidden"):   # those pass by themselves
+        db_execute("UPDATE channel_videos SET failures = failures + 1, last_error = ?, last_failed = ? "
+                   "WHERE video_id = ?", (record["error"], time.time(), vid))
+
+def write_batch_summary(results, started, elapsed):
+    ok = [r for r in results if r["status"] == "ok"]
+    total_bytes = sum(r["bytes"] for r in ok)
+    summary = {
+        "started": datetime.datetime.fromtimestamp(started).isoformat(timespec="seconds"),
+        "elapsed_seconds": round(elapsed, 2),
+        "jobs": len(results),
+        "ok": len(ok),
+        "failed": len(results) - len(ok),
+        "bytes": total_bytes,
+        "throughput_mib_s": round(total_bytes / 1048576 / elapsed, 2) if elapsed else 0,
+        "jobs_per_hour": round(len(results) * 3600 / elapsed, 1) if elapsed else 0,
+        "audio_tracks": sum(1 for r in ok if r["mode"] == "a"),
+        "tracks_per_minute": round(sum(1 for r in ok if r["mode"] == "a") * 60 / elapsed, 1) if elapsed else 0,
+        "network_workers": NETWORK_WORKERS,
+        "ffmpeg_workers": FFMPEG_WORKERS,
+        "audio_format": AUDIO_FORMAT,
+        "audio_encoders": AUDIO_ENCODERS,
+        "rate_limit_mbps": RATE_LIMIT_MBPS,
+        "failures": [{"url": r["url"], "error": r["error"]} for r in results if r["status"] != "ok"],
+        "results": results,
+    }
+    os.makedirs(BASE_PATH, exist_ok=True)
+    # Batches/syncs started in the same second (other processes, other hosts) get their own file
+    stamp = time.strftime('%Y%m%d-%H%M%S', time.localtime(started))
+    path = os.path.join(BASE_PATH, f"batch-{stamp}-{uuid.uuid4().hex[:6]}.json")
+    with open(path, "x", encoding="utf-8") as f:
+        json.dump(summary, f, indent=2)
+    return path, summary
+
+def _batch_worker(pending, results, lock):
+    while True:
+        _, _, job = pending.get()
+        if job is None:
+            return
+        record = run_job(job)
+        with lock:
+            results.append(record)
+
+def run_batch(lines, default_mode="v", default_res=None):
+    """Download every job from an iterable of batch lines through the worker pool."""
+    jobs = [job for job in (parse_batch_line(l, default_mode, default_res) for l in lines) if job]
+    return run_jobs(jobs)
+
+def run_jobs(jobs):
+    """Run parsed jobs through the worker pool and write the batch summary; True if all succeeded.
+
+    Workers take the cheapest queued job first (see job_priority), so audio and short
+    videos are not stuck behind a long 4K encode.
+    """
+    audio = any(job["mode"] == "a" for job in jobs)
+    limit = f", {RATE_LIMIT_MBPS} Mbit/s limit" if RATE_LIMIT_MBPS else ""
+    encoders = f" / {AUDIO_ENCODERS} {AUDIO_FORMAT} encoders" if audio else ""
+    print(f"📋 {len(jobs)} jobs, {NETWORK_WORKERS} network / {FFMPEG_WORKERS} ffmpeg workers{encoders}{limit}")
+
+    started = time.time()
+    start = time.monotonic()
+    results = []
+    results_lock = threading.Lock()
+    # Enough job threads to keep every network slot busy while others sit in ffmpeg
+    workers = NETWORK_WORKERS + max(FFMPEG_WORKERS, AUDIO_ENCODERS if audio else 0)
+    # Bounded, so the (lazy) channel enumeration never runs far ahead of the workers
+    pending = queue.PriorityQueue(maxsize=workers * 4)
+    threads = [threading.Thread(target=_batch_worker, args=(pending, results, results_lock))
+               for _ in range(workers)]
+    for t in threads:
+        t.start()
+    seq = 0
+    for seq, job in enumerate(expand_jobs(jobs)):
+        pending.put((job_priority(job), seq, job))
+    for i in range(workers):
+        pending.put((math.inf, seq + 1 + i, None))   # one stop marker per worker, after every job
+    for t in threads:
+        t.join()
+    path, summary = write_batch_summary(results, started, time.monotonic() - start)
+
+    tracks = f", {summary['tracks_per_minute']} tracks/min" if summary["audio_tracks"] else ""
+    print(f"\n📊 {summary['ok']}/{summary['jobs']} ok, {summary['failed']} failed, "
+          f"{summary['throughput_mib_s']} MiB/s, {summary['jobs_per_hour']} jobs/h{tracks}")
+    print(f"Summary written to {path}")
+    return summary["failed"] == 0
+
+# ------------------------------------------------------------------
+# Channel sync (persistent channel index, only new uploads are listed)
+# ------------------------------------------------------------------
+CHANNELS_FILE = "channels.txt"
+CHANNEL_PATH_RE = re.compile(r"^/(@[^/]+|channel/[^/]+|c/[^/]+|user/[^/]+)/?$")
+
+def channel_uploads_url(url):
+    """The uploads tab of a channel URL (listed newest first); other URLs are returned as is."""
+    parsed = urllib.parse.urlparse(url)
+    if CHANNEL_PATH_RE.match(parsed.path):
+        return parsed._replace(path=parsed.path.rstrip("/") + "/videos").geturl()
+    return url
+
+def _entry_upload_date(entry):
+    if entry.get("upload_date"):
+        return entry["upload_date"]
+    ts = entry.get("timestamp") or entry.get("release_timestamp")
+    return datetime.datetime.fromtimestamp(ts, datetime.timezone.utc).strftime("%Y%m%d") if ts else None
+
+def sync_channel(job):
+    """Index the uploads added since the last sync and return the video jobs still to download.
+
+    The listing is newest first, so it stops at the first already indexed video and
+    only the first page(s) are fetched. Indexed videos without a matching download
+    (new ones and earlier failures) become jobs; the job resolution acts as a cap.
+    """
+    url = channel_uploads_url(job["url"])
+    known = {vid for (vid,) in db_execute("SELECT video_id FROM channel_videos WHERE channel_url = ?", (url,))}
+    new = []
+    for entry in iter_entries(url):
+        if entry.get("id") in known:
+            break
+        new.append(entry)
+
+    now = time.time()
+    with _db_lock:
+        for entry in new:
+            heights = [res for (mode, res) in _archive_index().get(entry["id"], {}) if mode == "v"]
+            db_execute("INSERT OR IGNORE INTO channel_videos (channel_url, video_id, title, upload_date, duration, "
+                       "max_height, added) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                       (url, entry["id"], entry.get("title"), _entry_upload_date(entry), entry.get("duration"),
+                        max(heights, default=None), now))
+        db_execute("INSERT OR REPLACE INTO channels VALUES (?, ?, ?)", (url, now, len(new)))
+        rows = db_execute("SELECT video_id, failures, last_failed FROM channel_videos WHERE channel_url = ? "
+                          "ORDER BY upload_date DESC", (url,))
+    # Videos that keep failing (private, members-only, region-blocked) are retried ever less often
+    waiting = {vid for vid, failures, last_failed in rows if failures and
+               now - last_failed < min(SYNC_RETRY_MAX_DAYS, SYNC_RETRY_DAYS * 2 ** (failures - 1)) * 86400}
+    todo = [vid for vid, _, _ in rows
+            if vid not in waiting and not archive_hit(vid, job["mode"], max_height=job["resolution"])]
+    later = f", {len(waiting)} failed earlier and wait" if waiting else ""
+    print(f"🔄 {url}: {len(new)} new, {len(todo)} to download{later}")
+    return [dict(job, url=normalize_url(vid), resolution=None, max_height=job["resolution"]) for vid in todo]
+
+def _fill_channel_index():
+    """Complete upload dates/durations the flat listing lacked from the (local) info cache."""
+    rows = db_execute("SELECT DISTINCT video_id FROM channel_videos WHERE upload_date IS NULL OR duration IS NULL")
+    for (vid,) in rows:
+        info = _info_cache_get(_info_cache_key(vid))
+        if info:
+            db_execute("UPDATE channel_videos SET upload_date = COALESCE(upload_date, ?), "
+                       "duration = COALESCE(duration, ?) WHERE video_id = ?",
+                       (info.get("upload_date"), info.get("duration"), vid))
+
+def sync_channels(lines, default_mode="v", default_res=None):
+    """--sync: list every channel (in parallel) for new uploads, then download them as a batch."""
+    channels = [job for job in (parse_batch_line(l, default_mode, default_res) for l in lines) if job]
+    print(f"🔄 Syncing {len(channels)} channels")
+    start = time.monotonic()
+    jobs = []
+    with concurrent.futures.ThreadPoolExecutor(max_workers=NETWORK_WORKERS) as pool:
+        futures = {pool.submit(sync_channel, job): job for job in channels}
+        for future in concurrent.futures.as_completed(futures):
+            try:
+                jobs += future.result()
+            except Exception as e:
+                jobs.append(dict(futures[future], error=f"channel sync failed: {e}"))
+    print(f"🔄 Listing took {time.monotonic() - start:.1f}s")
+    if not jobs:
+        print("✅ All channels up to date")
+        return True
+    try:
+        return run_jobs(jobs)
+    finally:
+        _fill_channel_index()
+
+# ------------------------------------------------------------------
+# Daemon mode (warm process with a local HTTP job API)
+# ------------------------------------------------------------------
+class JobServer:
+    """Job table, priority queue and event log shared by the --serve API handlers."""
+
+    def __init__(self, workers):
+        self.jobs = collections.OrderedDict()   # id -> job record
+        self.running = {}                        # job context ("<id>:<mode>") -> job id
+        self.pending = queue.PriorityQueue()
+        self.events = collections.deque(maxlen=5000)
+        self.seq = 0
+        self.cond = threading.Condition()
+        for _ in range(workers):
+            threading.Thread(target=self._work, daemon=True).start()
+        threading.Thread(target=self._watch_live, daemon=True).start()
+
+    def publish(self, **event):
+        """Append an event and return its sequence number."""
+        with self.cond:
+            self.seq += 1
+            self.events.append({"seq": self.seq, "ts": round(time.time(), 3), **event})
+            self.cond.notify_all()
+            return self.seq
+
+    def events_after(self, seq, timeout=15):
+        """Events newer than seq; waits up to timeout seconds for the next one."""
+        with self.cond:
+            self.cond.wait_for(lambda: self.seq > seq, timeout)
+            return [e for e in self.events if e["seq"] > seq]
+
+    def snapshot(self, jid=None):
+        with self.cond:
+            if jid is None:
+                return [dict(r) for r in self.jobs.values()]
+            record = self.jobs.get(jid)
+            return dict(record) if record else None
+
+    def submit(self, job, parent=None):
+        record = dict(job, id=uuid.uuid4().hex[:10], status="queued", parent=parent, submitted=round(time.time(), 3))
+        with self.cond:
+            self.jobs[record["id"]] = record
+        seq = self.publish(job=record["id"], status="queued", url=job["url"], parent=parent)
+        # Channels/playlists are expanded first, so their videos join the queue early
+        priority = -1 if is_collection_url(job["url"]) and not job.get("error") else job_priority(job)
+        self.pending.put((priority, seq, record["id"]))
+        return record
+
+    def _update(self, jid, **fields):
+        with self.cond:
+            self.jobs[jid].update(fields)
+        self.publish(job=jid, **{k: v for k, v in fields.items() if k in ("status", "error", "file", "children")})
+
+    def _work(self):
+        while True:
+            _, _, jid = self.pending.get()
+            job = {k: v for k, v in self.snapshot(jid).items()
+                   if k in ("url", "mode", "resolution", "max_height", "error")}
+            self._update(jid, status="running", started=round(time.time(), 3))
+            if is_collection_url(job["url"]) and not job.get("error"):
+                children = [self.submit(child, parent=jid)["id"] for child in expand_jobs([job])]
+                self._update(jid, status="ok", children=children)
+                continue
+            context = f"{video_id(job['url']) or job['url']}:{job['mode']}"   # as set by instrumented_job
+            with self.cond:
+                self.running[context] = jid
+            try:
+                result = run_job(job)
+            finally:
+                with self.cond:
+                    self.running.pop(context, None)
+            self._update(jid, **{k: result[k] for k in ("status", "error", "file", "bytes", "seconds")})
+
+    def live(self, jid):
+        """Live status texts of a running job, by stream."""
+        with self.cond:
+            contexts = [c for c, j in self.running.items() if j == jid]
+        with _live_lock:
+            return {k: v for k, v in _live.items() if k.split("/")[0] in contexts}
+
+    def _watch_live(self):
+        """Turn live status line changes into progress events (same cadence as the terminal line)."""
+        shown = {}
+        while True:
+            time.sleep(0.5)
+            with _live_lock:
+                current = dict(_live)
+            for key, text in current.items():
+                if shown.get(key) != text:
+                    with self.cond:
+                        jid = self.running.get(key.split("/")[0])
+                    if jid:
+                        self.publish(job=jid, stream=key.partition("/")[2] or None, progress=text)
+            shown = current
+
+class _ApiHandler(http.server.BaseHTTPRequestHandler):
+    """POST /jobs, GET /jobs, GET /jobs/<id>, GET /events?since=<seq> (NDJSON stream)."""
+
+    def _send(self, code, body):
+        data = json.dumps(body).encode()
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        jobs = self.server.jobs
+        url = urllib.parse.urlparse(self.path)
+        path = url.path.rstrip("/")
+        if path == "/jobs":
+            self._send(200, jobs.snapshot())
+        elif path.startswith("/jobs/"):
+            record = jobs.snapshot(path[len("/jobs/"):])
+            if record is None:
+                self._send(404, {"error": "unknown job"})
+            else:
+                self._send(200, dict(record, live=jobs.live(record["id"])))
+        elif path == "/events":
+            self._stream_events(int(urllib.parse.parse_qs(url.query).get("since", ["0"])[0]))
+        else:
+            self._send(404, {"error": "not found"})
+
+    def _stream_events(self, seq):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.end_headers()
+        try:
+            while True:
+                for event in self.server.jobs.events_after(seq):
+                    self.wfile.write((json.dumps(event) + "\n").encode())
+                    seq = event["seq"]
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass   # client went away
+
+    def do_POST(self):
+        if self.path.rstrip("/") != "/jobs":
+            self._send(404, {"error": "not found"})
+            return
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0)).decode("utf-8")
+        try:
+            # Batch lines (`URL [a|v] [resolution]` / JSON objects), or a JSON list of job objects and batch lines
+            lines = body.splitlines()
+            if body.lstrip().startswith("["):
+                lines = [json.dumps(j) if isinstance(j, dict) else j for j in json.loads(body)]
+                if not all(isinstance(l, str) for l in lines):
+                    raise TypeError("list items must be job objects or batch lines")
+            jobs = [job for job in (parse_batch_line(l) for l in lines) if job]
+        except (ValueError, KeyError, TypeError) as e:
+            self._send(400, {"error": f"bad job: {e}"})
+            return
+        with self.server.jobs.cond:
+            seq = self.server.jobs.seq
+        self._send(201, {"seq": seq, "jobs": [self.server.jobs.submit(job) for job in jobs]})
 
-            ydl_opts_fallback = {
-                "format": "bestvideo+bestaudio/best",
-                "outtmpl": outtmpl,
-                "merge_output_format": "mp4",
-                "recode-video": "mp4",
-                "sanitize_info": sanitize,
-                "extractor_args": {"youtube": {"player_client": "web"}},
-                "cookiesfrombrowser": ("firefox",),
-            }
+    def log_message(self, *args):
+        pass
 
-            with yt_dlp.YoutubeDL(ydl_opts_fallback) as ydl:
-                ydl.download([url])
+def serve_api(host=SERVE_HOST, port=SERVE_PORT):
+    """--serve: keep yt-dlp, cookies and connections warm and run submitted jobs."""
+    _session()   # load browser cookies once, before the first job arrives
+    server = http.server.ThreadingHTTPServer((host, port), _ApiHandler)
+    server.jobs = JobServer(NETWORK_WORKERS + max(FFMPEG_WORKERS, AUDIO_ENCODERS))   # as run_jobs
+    print(f"🛰  Serving the job API on http://{host}:{port} (Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
 
-        print(f"✅ Video downloaded to template: {outtmpl}")
+def submit_jobs(lines, wait=False, host=SERVE_HOST, port=SERVE_PORT):
+    """--submit: hand jobs to a running daemon; with wait, follow their events until done."""
+    base = f"http://{host}:{port}"
+    request = urllib.request.Request(f"{base}/jobs", data="\n".join(lines).encode("utf-8"), method="POST",
+                                     headers={"Content-Type": "text/plain; charset=utf-8"})
+    with urllib.request.urlopen(request) as resp:
+        reply = json.load(resp)
+    ids = {r["id"] for r in reply["jobs"]}
+    for record in reply["jobs"]:
+        print(f"📥 {record['id']} queued: {record['url']}")
+    if not wait:
+        return True
+
+    unfinished, ok = set(ids), True
+    with urllib.request.urlopen(f"{base}/events?since={reply['seq']}") as resp:
+        for line in resp:
+            event = json.loads(line)
+            if event.get("parent") in ids:
+                ids.add(event["job"])
+                unfinished.add(event["job"])
+            if event["job"] not in ids:
+                continue
+            if event.get("progress"):
+                print(f"   {event['job']} {event['progress']}")
+            elif event.get("status") in ("ok", "failed"):
+                ok &= event["status"] == "ok"
+                icon = "✅" if event["status"] == "ok" else "❌"
+                print(f"{icon} {event['job']} {event.get('file') or event.get('error') or ''}")
+                unfinished.discard(event["job"])
+                if not unfinished:
+                    break
+    return ok
+
+# ------------------------------------------------------------------
+# Distributed workers (shared job queue in the state DB on base_path, leased jobs)
+# ------------------------------------------------------------------
+WORKER_POLL = 5   # seconds between looks at an empty queue
+
+def enqueue_jobs(jobs):
+    """Append jobs to the shared queue; channels/playlists are expanded by the worker that takes them."""
+    now = time.time()
+    # jobs may be a lazy generator that lists channels over the network: consume it before
+    # taking the DB lock, which the lease heartbeats of running jobs need
+    rows = [(json.dumps(job), -1 if is_collection_url(job["url"]) and not job.get("error") else job_priority(job), now)
+            for job in jobs]
+    with _db_lock:
+        for row in rows:
+            db_execute("INSERT INTO queue (job, priority, status, enqueued) VALUES (?, ?, 'queued', ?)", row)
+    return len(rows)
+
+def claim_job(worker, audio_only=False):
+    """Lease the most urgent queued job (or one whose lease expired); (id, token, job) or None."""
+    token = uuid.uuid4().hex
+    now = time.time()
+    with _db_lock:
+        db_execute("UPDATE queue SET status = 'failed', finished = ?, result = ? "
+                   "WHERE status = 'leased' AND lease_until < ? AND attempts >= ?",
+                   (now, json.dumps({"error": f"worker lost {MAX_ATTEMPTS} times"}), now, MAX_ATTEMPTS))
+        # One statement, so two workers can never lease the same row
+        db_execute("UPDATE queue SET status = 'leased', lease = ?, worker = ?, lease_until = ?, attempts = attempts + 1 "
+                   "WHERE id = (SELECT id FROM queue WHERE (status = 'queued' "
+                   "OR (status = 'leased' AND lease_until < ?)) AND (? OR json_extract(job, '$.mode') = 'a') "
+                   "ORDER BY priority, id LIMIT 1)",
+                   (token, worker, now + LEASE_SECONDS, now, not audio_only))
+        rows = db_execute("SELECT id, job, attempts FROM queue WHERE lease = ? AND status = 'leased'", (token,))
+    if not rows:
+        return None
+    qid, job, attempts = rows[0]
+    if attempts > 1:
+        print(f"↻ Re-leased job {qid} (attempt {attempts}, previous worker stopped renewing)")
+    return qid, token, json.loads(job)
+
+def _renew_lease(qid, token, stop):
+    """Heartbeat: extend the lease while the job runs, so only crashed workers lose their jobs."""
+    while not stop.wait(LEASE_SECONDS / 3):
+        with _db_lock:
+            db_execute("UPDATE queue SET lease_until = ? WHERE id = ? AND lease = ?",
+                       (time.time() + LEASE_SECONDS, qid, token))
+            if not db_execute("SELECT 1 FROM queue WHERE id = ? AND lease = ?", (qid, token)):
+                print(f"⚠ Lost the lease on job {qid}; another worker took it over")
+                return
+
+def complete_job(qid, token, record):
+    result = {k: record.get(k) for k in ("file", "error", "seconds", "children")}
+    db_execute("UPDATE queue SET status = ?, result = ?, finished = ?, lease_until = NULL WHERE id = ? AND lease = ?",
+               (record["status"], json.dumps(result), time.time(), qid, token))
+
+def _queue_worker(worker, stop, audio_only=False):
+    while not stop.is_set():
+        claimed = claim_job(worker, audio_only)
+        if not claimed:
+            stop.wait(WORKER_POLL)
+            continue
+        qid, token, job = claimed
+        heartbeat = threading.Event()
+        threading.Thread(target=_renew_lease, args=(qid, token, heartbeat), daemon=True).start()
+        try:
+            if is_collection_url(job["url"]) and not job.get("error"):
+                children = enqueue_jobs(expand_jobs([job]))
+                record = dict(job, status="ok", error=None, children=children)
+                print(f"📋 {job['url']}: {children} videos queued")
+            else:
+                record = run_job(job)
+        finally:
+            heartbeat.set()
+        complete_job(qid, token, record)
+
+def run_worker():
+    """--worker: take jobs from the shared queue until Ctrl+C (running jobs are finished first)."""
+    worker = f"{socket.gethostname()}:{os.getpid()}"
+    stop = threading.Event()
+    threads = [threading.Thread(target=_queue_worker, args=(worker, stop))
+               for _ in range(NETWORK_WORKERS + FFMPEG_WORKERS)]
+    # Extra threads for the audio encoders; they only lease audio jobs, so this host
+    # never holds more video jobs than it can work on
+    threads += [threading.Thread(target=_queue_worker, args=(worker, stop, True))
+                for _ in range(max(0, AUDIO_ENCODERS - FFMPEG_WORKERS))]
+    print(f"🏭 Worker {worker}: {len(threads)} job threads on {STATE_DB}")
+    for t in threads:
+        t.start()
+    try:
+        while any(t.is_alive() for t in threads):
+            time.sleep(1)
+    except KeyboardInterrupt:
+        print("\n⏹  Stopping after the running jobs…")
+        stop.set()
+        for t in threads:
+            t.join()
+
+def queue_status():
+    """Print the shared queue: counts per status and who holds the running jobs."""
+    counts = dict(db_execute("SELECT status, COUNT(*) FROM queue GROUP BY status"))
+    print(", ".join(f"{status}: {counts.get(status, 0)}" for status in ("queued", "leased", "ok", "failed")))
+    now = time.time()
+    for qid, job, worker, lease_until in db_execute(
+            "SELECT id, job, worker, lease_until FROM queue WHERE status = 'leased' ORDER BY id"):
+        state = "running" if lease_until >= now else "lease expired"
+        print(f"  {qid:>6} {worker:<24} {state:<14} {json.loads(job)['url']}")
+    for qid, job, result in db_execute(
+            "SELECT id, job, result FROM queue WHERE status = 'failed' ORDER BY finished DESC LIMIT 10"):
+        print(f"❌ {qid:>6} {json.loads(job)['url']}: {json.loads(result or '{}').get('error')}")
+
+def set_audio(audio_format=None, encoders=None):
+    """Override the audio output format and the number of audio encoder slots."""
+    global AUDIO_FORMAT, AUDIO_ENCODERS, AUDIO_SLOTS
+    if audio_format:
+        AUDIO_FORMAT = audio_format
+    if encoders:
+        AUDIO_ENCODERS = encoders
+        AUDIO_SLOTS = threading.BoundedSemaphore(encoders)
+
+def set_workers(network=None, ffmpeg=None, rate_limit=None):
+    """Override the network/ffmpeg concurrency limits and rate limit (before any job starts)."""
+    global NETWORK_WORKERS, FFMPEG_WORKERS, NET_SLOTS, FFMPEG_SLOTS, RATE_LIMIT_MBPS
+    if rate_limit:
+        RATE_LIMIT_MBPS = rate_limit
+        RATE_LIMITER.set_rate(rate_limit)
+    if network:
+        NETWORK_WORKERS = network
+        NET_SLOTS = threading.BoundedSemaphore(network)
+    if ffmpeg:
+        FFMPEG_WORKERS = ffmpeg
+        FFMPEG_SLOTS = threading.BoundedSemaphore(ffmpeg)
 
 # ------------------------------------------------------------------
 # Main loop
@@ -257,32 +2560,52 @@ def download_video(url, resolution=None, output_path=BASE_PATH):
 def main():
     print("\n=== YouTube Downloader v1.0 (20250929) (High-res webm -> MP4 H.264/AAC) ===")
     print(f"Base download path: {BASE_PATH}\n")
+    if _startup_marks:
+        print_startup_times()   # first prompt only
+        _startup_marks.clear()
     url = input("Enter YouTube URL, video ID, or channel URL (or 'q' to quit): ").strip()
     if url.lower() == "q":
         return False  # exit loop
 
-    if not url.startswith("http"):
-        url = f"https://www.youtube.com/watch?v={url}"
+    url = normalize_url(url)
 
     choice = input("Download (a)udio or (v)ideo? [a/v]: ").strip().lower()
+    if is_collection_url(url):
+        # Channel/playlist: enumerate lazily, resolve each video only when downloading it
+        max_height = None
+        if choice != "a":
+            cap = input("Maximum resolution (e.g. 1080, 2160) or press Enter for best: ").strip().lower().rstrip("p")
+            max_height = int(cap) if cap.isdigit() else None
+        download_collection(url, mode=choice if choice == "a" else "v", max_height=max_height)
+        print()
+        return True
+
     if choice == "a":
         download_audio(url)
         print("✅ Audio downloaded successfully.")
     else:
+        hit = archive_hit(video_id(url), "v")
+        if hit and input(f"⏭  Already downloaded: {hit}\nDownload again in another resolution? [y/N]: ").strip().lower() != "y":
+            print()
+            return True
+
         info = get_info(url)
         resolutions = list_resolutions(info)
         if not resolutions:
             print("No resolutions available.")
             return True
 
+        index = format_index(info)
         print("Available resolutions:")
         for i, r in enumerate(resolutions, 1):
-            print(f"{i}. {r}p")
+            print(f"{i}. {r:>4}p  {index.describe(r)}")
 
         sel = input(f"Select resolution [1-{len(resolutions)}] or press Enter for best: ").strip()
         res = None
         if sel.isdigit() and 1 <= int(sel) <= len(resolutions):
             res = resolutions[int(sel)-1]
+        elif hit:
+            res = resolutions[-1]   # "best" would match the archived copy and download nothing
 
         download_video(url, resolution=res)
         print("✅ Video downloaded successfully.")
@@ -290,7 +2613,88 @@ def main():
     print()
     return True
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="YouTube downloader (interactive when run without options)")
+    parser.add_argument("--batch", metavar="FILE",
+                        help="non-interactive: read jobs (`URL [a|v] [resolution]` or JSON) from FILE, '-' for stdin")
+    parser.add_argument("--sync", metavar="FILE", nargs="?", const=CHANNELS_FILE,
+                        help=f"download the new uploads of every channel in FILE (default {CHANNELS_FILE})")
+    parser.add_argument("--serve", action="store_true",
+                        help=f"run as a daemon with a local job API on {SERVE_HOST}:{SERVE_PORT}")
+    parser.add_argument("--submit", nargs="+", metavar="JOB",
+                        help="send one job (`URL [a|v] [resolution]`) to a running --serve daemon")
+    parser.add_argument("--wait", action="store_true", help="with --submit: follow the job until it finishes")
+    parser.add_argument("--enqueue", metavar="FILE",
+                        help="add jobs from FILE ('-' for stdin) to the shared queue for --worker processes")
+    parser.add_argument("--worker", action="store_true",
+                        help="run jobs from the shared queue (state DB on base_path) until Ctrl+C")
+    parser.add_argument("--queue-status", action="store_true", help="show the shared job queue and exit")
+    parser.add_argument("--mode", choices=["a", "v"], default="v", help="default job mode for --batch/--sync")
+    parser.add_argument("--resolution", default=None,
+                        help="default resolution for --batch/--sync (e.g. 1440, best; a cap for channels)")
+    parser.add_argument("--network-workers", type=int, help="concurrent downloads/probes")
+    parser.add_argument("--ffmpeg-workers", type=int, help="concurrent ffmpeg encodes")
+    parser.add_argument("--rate-limit", type=float, metavar="MBPS", help="global download limit in Mbit/s")
+    parser.add_argument("--audio-format", choices=["mp3", "opus", "native"],
+                        help="audio jobs: MP3 192k, Opus 128k or the native m4a/opus stream without transcoding")
+    parser.add_argument("--audio-encoders", type=int, help="concurrent audio encodes (default: one per core)")
+    parser.add_argument("--metrics-report", action="store_true",
+                        help="summarize per-stage timings from the metrics log and exit")
+    parser.add_argument("--check-ytdlp", action="store_true",
+                        help="install/upgrade yt-dlp if it is missing or the update check is due, then exit")
+    parser.add_argument("--rescan-archive", action="store_true",
+                        help="re-index the files already present under base_path and exit")
+    return parser.parse_args()
+
 if __name__ == "__main__":
+    startup_mark("imports")
+    args = parse_args()
+    if args.submit:   # thin client: no workspaces, no yt-dlp session
+        sys.exit(0 if submit_jobs([" ".join(args.submit)], args.wait) else 1)
+    if args.check_ytdlp:
+        print(f"yt-dlp {check_ytdlp_version(wait=True)}")
+        sys.exit(0)
+    check_ytdlp_version()
+    startup_mark("version check")
+    set_workers(args.network_workers, args.ffmpeg_workers, args.rate_limit)
+    set_audio(args.audio_format, args.audio_encoders)
+    sweep_workspaces()
+    startup_mark("workspace sweep")
+    if args.metrics_report:
+        metrics_report()
+        sys.exit(0)
+    if args.rescan_archive:
+        print(f"🗂  Download archive: {rescan_archive()} files indexed")
+        sys.exit(0)
+    if args.serve:
+        serve_api()
+        sys.exit(0)
+    if args.queue_status:
+        queue_status()
+        sys.exit(0)
+    if args.enqueue:
+        if args.enqueue == "-":
+            lines = sys.stdin.readlines()
+        else:
+            with open(args.enqueue, "r", encoding="utf-8") as f:
+                lines = f.readlines()
+        jobs = [job for job in (parse_batch_line(l, args.mode, args.resolution) for l in lines) if job]
+        print(f"📥 {enqueue_jobs(jobs)} jobs queued")
+        sys.exit(0)
+    if args.worker:
+        run_worker()
+        sys.exit(0)
+    if args.sync:
+        with open(args.sync, "r", encoding="utf-8") as f:
+            sys.exit(0 if sync_channels(f.readlines(), args.mode, args.resolution) else 1)
+    if args.batch:
+        if args.batch == "-":
+            ok = run_batch(sys.stdin, args.mode, args.resolution)
+        else:
+            with open(args.batch, "r", encoding="utf-8") as f:
+                ok = run_batch(f.readlines(), args.mode, args.resolution)
+        sys.exit(0 if ok else 1)
+
     while True:
         if not main():
             print("👋 Exiting YouTube Downloader. Goodbye!")